@@ -0,0 +1,78 @@
+def _cents(record):
+    """Stock value of a product record in whole cents, so sums stay exact however often they change"""
+    return round(record['price'] * 100) * record['quantity']
+
+
+class InventoryAggregates:
+    """Inventory totals kept current as products change, so reading them costs no scan
+
+    Holds the product count, units in stock and stock value overall and per
+    category, and the number of products at or below the low-stock
+    threshold. The owner reports every change with add(), remove() or
+    update(); rebuild() and verify() recompute everything from the records.
+    """
+
+    def __init__(self, low_stock_threshold, records=()):
+        self.low_stock_threshold = low_stock_threshold
+        self.rebuild(records)
+
+    def rebuild(self, records):
+        """Recompute every total from scratch"""
+        self.product_count = 0
+        self.total_units = 0
+        self.total_cents = 0
+        self.low_stock_count = 0
+        self.categories = {}    # category ID -> [count, units, cents]
+        for record in records:
+            self.add(record)
+
+    def add(self, record, sign=1):
+        quantity = record['quantity']
+        cents = _cents(record)
+        self.product_count += sign
+        self.total_units += sign * quantity
+        self.total_cents += sign * cents
+        if quantity <= self.low_stock_threshold:
+            self.low_stock_count += sign
+
+        totals = self.categories.setdefault(record['category'], [0, 0, 0])
+        totals[0] += sign
+        totals[1] += sign * quantity
+        totals[2] += sign * cents
+        if totals[0] == 0:
+            del self.categories[record['category']]
+
+    def remove(self, record):
+        self.add(record, -1)
+
+    def update(self, old, new):
+        """Account for a product record that changed from old to new"""
+        self.remove(old)
+        self.add(new)
+
+    def summary(self):
+        """Get the totals as a plain dict"""
+        return {
+            'product_count': self.product_count,
+            'total_units': self.total_units,
+            'total_value': self.total_cents / 100,
+            'low_stock_threshold': self.low_stock_threshold,
+            'low_stock_count': self.low_stock_count,
+            'categories': {
+                category: {'count': count, 'units': units, 'value': cents / 100}
+                for category, (count, units, cents) in self.categories.items()
+            }
+        }
+
+    def verify(self, records):
+        """Compare the totals with a full scan of the records; returns the names of those that differ"""
+        return diff_summaries(self.summary(), InventoryAggregates(self.low_stock_threshold, records).summary())
+
+
+def diff_summaries(summary, expected):
+    """List the totals of an inventory summary that differ from the expected one"""
+    differences = [key for key in expected if key != 'categories' and summary[key] != expected[key]]
+    for category in set(summary['categories']) | set(expected['categories']):
+        if summary['categories'].get(category) != expected['categories'].get(category):
+            differences.append(f"categories[{category!r}]")
+    return differences
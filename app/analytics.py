@@ -0,0 +1,174 @@
+import math
+import threading
+from array import array
+from collections import defaultdict
+from datetime import date, datetime
+
+try:
+    import numpy as np
+except ImportError:
+    # Aggregations fall back to plain Python loops over the arrays
+    np = None
+
+# Transaction types are stored as a signed flag: the sign of the stock change
+TYPE_CODES = {"IN": 1, "OUT": -1}
+
+
+def _to_datetime(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _to_epoch(value):
+    if value is None:
+        return None
+    return _to_datetime(value).timestamp()
+
+
+class TransactionColumns:
+    """Column-oriented copy of the transaction history held in typed arrays
+
+    Each transaction is stored as a product code, quantity, type flag, epoch
+    timestamp, day ordinal and user code. Records whose timestamp cannot be
+    parsed get a NaN timestamp and day 0: they count in totals but fall in
+    no time range or day. Product IDs and users are
+    dictionary-encoded, so a row costs a few dozen bytes instead of a
+    Transaction object. Aggregations are vectorized with NumPy when it is
+    installed.
+
+    The store is shared and caught up with the log while others aggregate,
+    so appends and aggregations hold a lock: arrays cannot be resized while
+    NumPy views of them exist, and columns are only ever read at one length.
+    """
+
+    def __init__(self):
+        # Dictionary encodings: code -> value and value -> code
+        self.product_ids = []
+        self.users = [None]
+        self._product_codes = {}
+        self._user_codes = {None: 0}
+
+        self.product = array('i')
+        self.quantity = array('q')
+        self.type = array('b')
+        self.timestamp = array('d')
+        self.day = array('i')
+        self.user = array('i')
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.product)
+
+    @staticmethod
+    def _encode(values, codes, value):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def append(self, record):
+        """Append a transaction record (as stored in the log)"""
+        try:
+            timestamp = _to_datetime(record['timestamp'])
+            epoch, day = timestamp.timestamp(), timestamp.toordinal()
+        except (AttributeError, TypeError, ValueError):
+            epoch, day = math.nan, 0
+
+        with self._lock:
+            self.product.append(self._encode(self.product_ids, self._product_codes, record['product_id']))
+            self.quantity.append(record['quantity'])
+            self.type.append(TYPE_CODES.get(record['transaction_type'], 0))
+            self.timestamp.append(epoch)
+            self.day.append(day)
+            self.user.append(self._encode(self.users, self._user_codes, record.get('user')))
+
+    def extend(self, records):
+        """Append several transaction records"""
+        with self._lock:
+            for record in records:
+                self.append(record)
+
+    def _rows(self, since=None, until=None, transaction_type=None):
+        """Select rows matching the filters: a boolean mask with NumPy, otherwise a list of row numbers"""
+        since = _to_epoch(since)
+        until = _to_epoch(until)
+        type_code = TYPE_CODES.get(transaction_type) if transaction_type else None
+
+        if np is not None:
+            mask = np.ones(len(self), dtype=bool)
+            timestamps = np.frombuffer(self.timestamp, dtype='d')
+            if since is not None:
+                mask &= timestamps >= since
+            if until is not None:
+                mask &= timestamps <= until
+            if type_code is not None:
+                mask &= np.frombuffer(self.type, dtype='b') == type_code
+            return mask
+
+        timestamps = self.timestamp
+        types = self.type
+        return [
+            i for i in range(len(self))
+            if (since is None or timestamps[i] >= since)
+            and (until is None or timestamps[i] <= until)
+            and (type_code is None or types[i] == type_code)
+        ]
+
+    def count(self, since=None, until=None, transaction_type=None):
+        """Count transactions matching the filters"""
+        with self._lock:
+            rows = self._rows(since, until, transaction_type)
+            if np is not None:
+                return int(rows.sum())
+            return len(rows)
+
+    def total_quantity(self, since=None, until=None, transaction_type=None):
+        """Sum the quantities of transactions matching the filters"""
+        with self._lock:
+            rows = self._rows(since, until, transaction_type)
+            if np is not None:
+                return int(np.frombuffer(self.quantity, dtype='q')[rows].sum())
+            quantities = self.quantity
+            return sum(quantities[i] for i in rows)
+
+    def quantity_by_product(self, since=None, until=None, transaction_type=None):
+        """Sum quantities per product ID for transactions matching the filters"""
+        with self._lock:
+            rows = self._rows(since, until, transaction_type)
+            if np is not None:
+                totals = np.bincount(
+                    np.frombuffer(self.product, dtype='i')[rows],
+                    weights=np.frombuffer(self.quantity, dtype='q')[rows],
+                    minlength=len(self.product_ids))
+                return {self.product_ids[code]: int(total) for code, total in enumerate(totals) if total}
+
+            totals = defaultdict(int)
+            for i in rows:
+                totals[self.product_ids[self.product[i]]] += self.quantity[i]
+            return dict(totals)
+
+    def quantity_by_day_and_product(self, since=None, until=None, transaction_type=None):
+        """Sum quantities per (date, product ID) for transactions matching the filters"""
+        with self._lock:
+            rows = self._rows(since, until, transaction_type)
+            if np is not None:
+                # Undated records have no day to be counted in
+                rows &= np.frombuffer(self.day, dtype='i') != 0
+                products = np.frombuffer(self.product, dtype='i')[rows].astype('q')
+                days = np.frombuffer(self.day, dtype='i')[rows].astype('q')
+                keys, inverse = np.unique(days * len(self.product_ids) + products, return_inverse=True)
+                totals = np.bincount(inverse, weights=np.frombuffer(self.quantity, dtype='q')[rows])
+                return {
+                    (date.fromordinal(int(key) // len(self.product_ids)),
+                     self.product_ids[int(key) % len(self.product_ids)]): int(total)
+                    for key, total in zip(keys, totals)
+                }
+
+            totals = defaultdict(int)
+            for i in rows:
+                if not self.day[i]:
+                    continue
+                totals[(date.fromordinal(self.day[i]), self.product_ids[self.product[i]])] += self.quantity[i]
+            return dict(totals)
@@ -0,0 +1,165 @@
+import asyncio
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from .inventory_manager import InventoryManager
+
+
+class AsyncInventoryManager:
+    """asyncio version of InventoryManager for async (ASGI) web front-ends
+
+    Every method is a coroutine that runs the matching InventoryManager call
+    in a thread pool, so file I/O and JSON parsing never block the event
+    loop. It works on the same storage (and on-disk format) as
+    InventoryManager, and shares its instance with any InventoryManager on
+    the same data directory in this process. Writes from concurrent requests
+    are coalesced by the storage's background writer into shared commits.
+    """
+
+    def __init__(self, data_dir, backend=None, executor=None):
+        self.manager = InventoryManager(data_dir, backend)
+        self._executor = executor or ThreadPoolExecutor(thread_name_prefix='AsyncInventoryManager')
+
+    async def _run(self, fn, *args, **kwargs):
+        """Run a blocking call in the executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def commit(self):
+        """Wait until every change made so far is durable, without holding a thread"""
+        await asyncio.wrap_future(self.manager.db.commit())
+
+    def close(self):
+        """Shut down the executor once pending calls have finished"""
+        self._executor.shutdown(wait=True)
+
+    # Product management
+    async def add_product(self, name, description, price, quantity, category):
+        """Add a new product to inventory"""
+        return await self._run(self.manager.add_product, name, description, price, quantity, category)
+
+    async def add_products(self, products_data):
+        """Add several products at once; each item holds the add_product arguments"""
+        return await self._run(self.manager.add_products, products_data)
+
+    async def update_product(self, product_id, **kwargs):
+        """Update product details"""
+        return await self._run(self.manager.update_product, product_id, **kwargs)
+
+    async def get_product(self, product_id):
+        """Get product by ID"""
+        return await self._run(self.manager.get_product, product_id)
+
+    async def get_all_products(self):
+        """Get all products"""
+        return await self._run(self.manager.get_all_products)
+
+    async def get_products_page(self, limit=None, cursor=None, sort='name'):
+        """Get a page of products and the cursor of the next page (None on the last page)"""
+        return await self._run(self.manager.get_products_page, limit, cursor, sort)
+
+    async def delete_product(self, product_id):
+        """Delete a product"""
+        return await self._run(self.manager.delete_product, product_id)
+
+    async def search_products(self, search_term):
+        """Search products by name or description, best matches first"""
+        return await self._run(self.manager.search_products, search_term)
+
+    async def suggest(self, prefix, limit=10):
+        """Get up to limit categories and limit products whose name has a word starting with prefix"""
+        return await self._run(self.manager.suggest, prefix, limit)
+
+    async def get_products_by_category(self, category_id):
+        """Get products by category"""
+        return await self._run(self.manager.get_products_by_category, category_id)
+
+    async def count_products_by_category(self):
+        """Get the number of products in each category (category ID -> count)"""
+        return await self._run(self.manager.count_products_by_category)
+
+    async def get_low_stock_products(self, threshold=10):
+        """Get products with stock below threshold, lowest stock first"""
+        return await self._run(self.manager.get_low_stock_products, threshold)
+
+    async def get_inventory_summary(self):
+        """Get inventory totals: product count, units and value overall and per category, and low-stock count"""
+        return await self._run(self.manager.get_inventory_summary)
+
+    async def rebuild_inventory_summary(self):
+        """Recompute the inventory totals from scratch"""
+        return await self._run(self.manager.rebuild_inventory_summary)
+
+    async def verify_inventory_summary(self):
+        """Check the inventory totals against a full scan; returns the names of totals that differ"""
+        return await self._run(self.manager.verify_inventory_summary)
+
+    # Category management
+    async def add_category(self, name, description=None):
+        """Add a new category"""
+        return await self._run(self.manager.add_category, name, description)
+
+    async def update_category(self, category_id, **kwargs):
+        """Update category details"""
+        return await self._run(self.manager.update_category, category_id, **kwargs)
+
+    async def get_category(self, category_id):
+        """Get category by ID"""
+        return await self._run(self.manager.get_category, category_id)
+
+    async def get_all_categories(self):
+        """Get all categories"""
+        return await self._run(self.manager.get_all_categories)
+
+    async def delete_category(self, category_id):
+        """Delete a category; raises ValueError while products still belong to it"""
+        return await self._run(self.manager.delete_category, category_id)
+
+    # Inventory transactions
+    async def add_stock(self, product_id, quantity, user=None):
+        """Add stock to inventory (stock in)"""
+        return await self._run(self.manager.add_stock, product_id, quantity, user)
+
+    async def remove_stock(self, product_id, quantity, user=None):
+        """Remove stock from inventory (stock out)"""
+        return await self._run(self.manager.remove_stock, product_id, quantity, user)
+
+    async def add_transaction(self, product_id, quantity, transaction_type, note=None, user=None, timestamp=None):
+        """Add a transaction record directly"""
+        return await self._run(self.manager.add_transaction, product_id, quantity, transaction_type,
+                               note, user, timestamp)
+
+    async def add_transactions(self, transactions_data):
+        """Add several transaction records at once; either the whole batch is recorded or none of it"""
+        return await self._run(self.manager.add_transactions, transactions_data)
+
+    async def get_transaction_history(self, product_id=None, since=None, until=None):
+        """Get transaction history, optionally filtered by product ID and time range"""
+        return await self._run(self.manager.get_transaction_history, product_id, since, until)
+
+    async def iter_transactions(self, product_id=None, since=None, until=None, batch_size=500):
+        """Stream transaction history, reading it off the event loop batch_size records at a time"""
+        transactions = self.manager.iter_transactions(product_id, since, until)
+        while True:
+            batch = await self._run(list, itertools.islice(transactions, batch_size))
+            if not batch:
+                return
+            for transaction in batch:
+                yield transaction
+
+    async def get_transactions_page(self, limit=None, cursor=None, sort='timestamp', product_id=None,
+                                    since=None, until=None):
+        """Get a page of transaction history in time order and the cursor of the next page"""
+        return await self._run(self.manager.get_transactions_page, limit, cursor, sort, product_id, since, until)
+
+    async def get_generation(self, collection):
+        """Get (generation, last modified time in ns) of 'products', 'categories' or 'transactions'"""
+        return await self._run(self.manager.get_generation, collection)
+
+    async def get_transaction_columns(self):
+        """Get the columnar, array-backed transaction history used for analytics"""
+        return await self._run(self.manager.get_transaction_columns)
+
+    async def get_transactions(self, product_id=None):
+        """Alias for get_transaction_history for compatibility"""
+        return await self.get_transaction_history(product_id)
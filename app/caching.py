@@ -0,0 +1,62 @@
+import gzip
+import threading
+from collections import OrderedDict
+from . import config
+
+# Payloads smaller than this are not worth compressing
+GZIP_MIN_SIZE = 500
+
+
+class GenerationCache:
+    """Values derived from data at a given generation, kept until the data changes
+
+    An entry is only returned while the generation it was stored with is
+    still the current one, so a write anywhere invalidates it without the
+    writer having to know about the cache. At most max_entries are kept,
+    dropping the least recently used first.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = config.RESPONSE_CACHE_SIZE if max_entries is None else max_entries
+        self._entries = OrderedDict()    # key -> (generation, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, generation):
+        """Get the value stored for key at generation, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, generation, value):
+        with self._lock:
+            self._entries[key] = (generation, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class Payload:
+    """A serialized response body, with its gzip-compressed form made on first request"""
+
+    __slots__ = ('body', 'mimetype', '_gzipped')
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self._gzipped = None
+
+    def gzipped(self):
+        """Get the gzip-compressed body, or None if the body is too small to be worth it"""
+        if len(self.body) < GZIP_MIN_SIZE:
+            return None
+        if self._gzipped is None:
+            # mtime=0 makes the output depend on the body alone
+            self._gzipped = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._gzipped
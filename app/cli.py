@@ -1,5 +1,6 @@
 import os
 import argparse
+import itertools
 from datetime import datetime
 from .inventory_manager import InventoryManager
 
@@ -148,10 +149,13 @@ class InventoryCLI:
             print(f"Category with ID {args.id} not found.")
             return
         
-        if self.manager.delete_category(args.id):
-            print(f"Category '{category.name}' deleted successfully.")
-        else:
-            print(f"Failed to delete category with ID {args.id}.")
+        try:
+            if self.manager.delete_category(args.id):
+                print(f"Category '{category.name}' deleted successfully.")
+            else:
+                print(f"Failed to delete category with ID {args.id}.")
+        except ValueError as e:
+            print(f"Error: {e}")
     
     def add_stock(self, args):
         """Add stock to inventory"""
@@ -186,13 +190,15 @@ class InventoryCLI:
             if not product:
                 print(f"Product with ID {args.id} not found.")
                 return
-            transactions = self.manager.get_transaction_history(args.id)
+            transactions = self.manager.iter_transactions(args.id)
             title = f"Transaction history for product: {product.name}"
         else:
-            transactions = self.manager.get_transaction_history()
+            transactions = self.manager.iter_transactions()
             title = "All transactions"
         
-        if not transactions:
+        # Stream the history instead of loading it all; peek to detect an empty one
+        first = next(transactions, None)
+        if first is None:
             print("No transactions found.")
             return
         
@@ -200,7 +206,7 @@ class InventoryCLI:
         print(f"\n{'ID':<40} {'Product':<20} {'Type':<10} {'Quantity':<10} {'Date':<20} {'User':<15}")
         print("-" * 115)
         
-        for t in transactions:
+        for t in itertools.chain([first], transactions):
             product = self.manager.get_product(t.product_id)
             product_name = product.name if product else "Unknown"
             user = t.user if t.user else "N/A"
@@ -0,0 +1,28 @@
+import os
+
+# Storage backend used by InventoryManager: 'json' (flat files) or 'sqlite'
+STORAGE_BACKEND = os.environ.get('IMS_STORAGE_BACKEND', 'json')
+
+# Database file created inside the data directory by the SQLite backend
+SQLITE_FILENAME = os.environ.get('IMS_SQLITE_FILENAME', 'inventory.db')
+
+# Seconds the background writer waits to gather concurrent saves into one commit
+WRITE_INTERVAL = float(os.environ.get('IMS_WRITE_INTERVAL', '0.01'))
+
+# Number of logged transactions after which product quantities are checkpointed
+CHECKPOINT_INTERVAL = int(os.environ.get('IMS_CHECKPOINT_INTERVAL', '1000'))
+
+# Period covered by each transaction log partition: 'year', 'month' or 'day'
+TRANSACTION_PARTITION = os.environ.get('IMS_TRANSACTION_PARTITION', 'month')
+
+# Attempts InventoryManager.update_product makes when the product changes concurrently
+UPDATE_RETRIES = int(os.environ.get('IMS_UPDATE_RETRIES', '5'))
+
+# Keep binary snapshots of the JSON data files so they load without being re-parsed
+SNAPSHOT_CACHE = os.environ.get('IMS_SNAPSHOT_CACHE', '1') != '0'
+
+# Stock level at or below which a product counts as low in the dashboard and inventory totals
+LOW_STOCK_THRESHOLD = int(os.environ.get('IMS_LOW_STOCK_THRESHOLD', '5'))
+
+# Number of serialized API responses (and rendered pages) the web app keeps in memory
+RESPONSE_CACHE_SIZE = int(os.environ.get('IMS_RESPONSE_CACHE_SIZE', '128'))
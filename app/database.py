@@ -1,167 +1,807 @@
 import json
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from .models import Product, Category, Transaction
+from . import config
+from .aggregates import InventoryAggregates
+from .indexes import (PRODUCT_SORT_FIELDS, SORT_FIELD_TYPES, TRANSACTION_SORT_FIELDS, GroupIndex, PrefixIndex,
+                      SortedIndex, TextIndex, TransactionTimeIndex, decode_cursor, encode_cursor, page_entries,
+                      parse_sort)
+from .locking import FileLock
+from .models import (Product, Category, ProductView, CategoryView, TransactionView,
+                     VersionConflictError, format_timestamp)
+from .snapshot import dump_snapshot, load_snapshot, snapshot_path
+from .transaction_log import LogReader, TransactionIndex, TransactionLog, read_legacy_log
+from .writer import BackgroundWriter, atomic_write
 
 class Database:
     def __init__(self, data_dir):
         self.data_dir = data_dir
         self.products_file = os.path.join(data_dir, 'products.json')
         self.categories_file = os.path.join(data_dir, 'categories.json')
-        self.transactions_file = os.path.join(data_dir, 'transactions.json')
+        self.transactions_dir = os.path.join(data_dir, 'transactions')
+        self.legacy_transactions_files = [
+            os.path.join(data_dir, 'transactions.jsonl'),
+            os.path.join(data_dir, 'transactions.json'),
+        ]
+        self.generations_file = os.path.join(data_dir, 'generations.json')
+        
+        # Parsed file contents keyed by path: (signature, data)
+        self._cache = {}
+        self._lock = threading.RLock()
+        self.writer = BackgroundWriter()
+        
+        # Serializes writers across processes sharing the data directory
+        self.file_lock = FileLock(os.path.join(data_dir, '.lock'))
+        
+        # Log position reflected by the cached products and appends since the last checkpoint
+        self._products_reader = None
+        self._since_checkpoint = 0
+        
+        # Log truncations the cached products have seen, and the log position
+        # of the last checkpoint, whose partitions are known to be durable
+        self._log_truncations = None
+        self._checkpoint_position = None
+        
+        # Sort indexes over the cached products (field -> SortedIndex), built on first use
+        self._product_indexes = {}
+        
+        # Products per category (category ID -> product IDs), built on first use
+        self._category_index = None
+        
+        # Full-text index over product names and descriptions, built on first use
+        self._search_index = None
+        
+        # Name completion indexes, built on first use; the category one is
+        # paired with the cache entry it was built from
+        self._suggest_index = None
+        self._category_suggest = None
+        
+        # Inventory totals over the cached products, built on first use
+        self._aggregates = None
+        
+        # Transactions read so far and the log position they cover
+        self._transactions = []
+        self._transactions_reader = None
+        self._transactions_lock = threading.Lock()
+        
+        # Columnar analytics copy of the log, built on first use
+        self._columns = None
+        self._columns_reader = None
         
         # Initialize data files if they don't exist
         self._initialize_data_files()
+        self.transaction_log = TransactionLog(self.transactions_dir, writer=self.writer,
+                                              on_truncate=self._log_truncated)
+        self._migrate_legacy_transactions()
+        self.transaction_index = TransactionIndex(self.transaction_log)
+        self.transaction_time_index = TransactionTimeIndex(self.transaction_log)
     
     def _initialize_data_files(self):
         """Initialize empty data files if they don't exist"""
-        for file_path in [self.products_file, self.categories_file, self.transactions_file]:
+        for file_path in [self.products_file, self.categories_file]:
             if not os.path.exists(file_path):
                 with open(file_path, 'w') as f:
                     json.dump([], f)
     
-    def _load_data(self, file_path):
-        """Load data from a JSON file"""
+    def _migrate_legacy_transactions(self):
+        """Move transactions from the single-file log of older versions into partitions"""
+        for legacy_file in self.legacy_transactions_files:
+            if os.path.exists(legacy_file):
+                break
+        else:
+            return
+        
+        with self._exclusive():
+            signature, data = self._read_file(self.products_file)
+            if isinstance(data, dict) and 'transactions_positions' in data:
+                # Already migrated; a previous run stopped before renaming the file
+                os.replace(legacy_file, legacy_file + '.migrated')
+                return
+            
+            entries = read_legacy_log(legacy_file)
+            if isinstance(data, dict):
+                # Catch the checkpoint up with the part of the log written after it
+                products = {record['product_id']: record for record in data['products']}
+                for end_offset, transaction_data in entries:
+                    if end_offset is not None and end_offset > data['transactions_offset']:
+                        self._apply_transaction(products, transaction_data)
+                data = list(products.values())
+            
+            # Write the partitions first: until products.json records positions
+            # into them, a crash here just means migrating again
+            positions = self.transaction_log.write_partitions([record for _, record in entries])
+            atomic_write(self.products_file, json.dumps({
+                'transactions_positions': positions,
+                'products': data
+            }, indent=2))
+            os.replace(legacy_file, legacy_file + '.migrated')
+    
+    def _load_generations(self):
+        """Load the per-file write generation counters"""
         try:
-            with open(file_path, 'r') as f:
+            with open(self.generations_file, 'r') as f:
                 return json.load(f)
         except (json.JSONDecodeError, FileNotFoundError):
-            return []
+            return {}
+    
+    def _bump_generation(self, name, step=1):
+        """Increment the stored generation of a file or directory; returns all generations"""
+        generations = self._load_generations()
+        generations[name] = generations.get(name, 0) + step
+        atomic_write(self.generations_file, json.dumps(generations))
+        return generations
+    
+    def _log_truncated(self, removed):
+        """Record a truncation of the transaction log, so every process rereads products from the checkpoint
+        
+        The log's generation goes up by the bytes removed plus one, so adding it
+        to the log size gives a number that still grows on every change.
+        """
+        self._bump_generation(os.path.basename(self.transactions_dir), removed + 1)
+    
+    def _get_signature(self, file_path, generations=None):
+        """Get the (mtime, size, generation) signature used to validate the cache"""
+        if generations is None:
+            generations = self._load_generations()
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, generations.get(os.path.basename(file_path), 0))
+    
+    def get_generation(self, collection):
+        """Get the generation and last modification time (ns) of 'products', 'categories' or 'transactions'
+        
+        The generation grows whenever the collection changes, in any process,
+        and is worked out from file metadata without reading the data files.
+        """
+        if collection == 'categories':
+            mtime_ns, _, generation = self._get_signature(self.categories_file) or (0, 0, 0)
+            return generation, mtime_ns
+        if collection not in ('products', 'transactions'):
+            raise ValueError(f"Unknown collection: {collection}")
+        
+        # Truncations happen under the exclusive lock, so the log size and
+        # the count of bytes truncated from it are read consistently
+        with self.file_lock.shared():
+            generations = self._load_generations()
+            log_size, log_mtime_ns = self.transaction_log.size_and_mtime()
+        log_generation = log_size + generations.get(os.path.basename(self.transactions_dir), 0)
+        if collection == 'transactions':
+            return log_generation, log_mtime_ns
+        
+        # Stock movements change products without rewriting products.json;
+        # both parts only ever grow, so their sum does too
+        mtime_ns, _, generation = self._get_signature(self.products_file, generations) or (0, 0, 0)
+        return generation + log_generation, max(mtime_ns, log_mtime_ns)
+    
+    def _is_cache_fresh(self, file_path, generations=None):
+        """Check whether the cached copy of a file can be served without reading the file"""
+        cached = self._cache.get(file_path)
+        if cached is None:
+            return False
+        signature = self._get_signature(file_path, generations)
+        return signature is not None and cached[0] == signature
+    
+    def _read_file(self, file_path):
+        """Read and parse a JSON data file, returning its cache signature and contents
+        
+        Parsing is skipped when the binary snapshot of the file is still valid.
+        """
+        with self.file_lock.shared():
+            signature = self._get_signature(file_path)
+            try:
+                with open(file_path, 'rb') as f:
+                    content = f.read()
+            except FileNotFoundError:
+                content = b''
+        
+        if not content.strip():
+            return signature, []
+        
+        if config.SNAPSHOT_CACHE and signature:
+            data = load_snapshot(file_path, content, signature[0])
+            if data is not None:
+                return signature, data
+        
+        try:
+            data = json.loads(content)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            # Refuse to carry on with (and later overwrite) a damaged file
+            raise ValueError(f"Data file {file_path} is corrupt")
+        
+        if config.SNAPSHOT_CACHE and signature:
+            self._save_snapshot(file_path, content, signature[0], data)
+        return signature, data
+    
+    def _save_snapshot(self, file_path, content, mtime_ns, data):
+        """Write the binary snapshot of a data file in the background"""
+        # Serialize now: the parsed records are cached and will change
+        snapshot = dump_snapshot(content, mtime_ns, data)
+        path = snapshot_path(file_path)
+        self.writer.submit(path, lambda: atomic_write(path, snapshot, durable=False))
+    
+    def _load_data(self, file_path, key):
+        """Load records from a JSON file as a dict keyed by ID, served from the cache while the file is unchanged"""
+        with self._lock:
+            if self._is_cache_fresh(file_path):
+                return self._cache[file_path][1]
+            
+            signature, data = self._read_file(file_path)
+            
+            # Index records by ID; dicts keep insertion order so file order is preserved
+            records = {record[key]: record for record in data}
+            self._cache[file_path] = (signature, records)
+            return records
+    
+    def _load_products(self):
+        """Load products: the checkpointed snapshot plus every transaction logged after it"""
+        with self._lock:
+            generations = self._load_generations()
+            truncations = generations.get(os.path.basename(self.transactions_dir), 0)
+            if self._is_cache_fresh(self.products_file, generations) and truncations == self._log_truncations:
+                records = self._cache[self.products_file][1]
+                self._replay_transactions(records)
+                return records
+            
+            # Start over from the checkpoint also when the log was cut back,
+            # since the position read so far may be past its end
+            signature, data = self._read_file(self.products_file)
+            if isinstance(data, list):
+                # Written before checkpointing existed, so it already reflects the whole log
+                products, position = data, self.transaction_log.end_position()
+                self._checkpoint_position = None
+            else:
+                products, position = data['products'], data['transactions_positions']
+                self._checkpoint_position = dict(position)
+            
+            records = {record['product_id']: record for record in products}
+            self._cache[self.products_file] = (signature, records)
+            self._log_truncations = truncations
+            self._products_reader = LogReader(self.transaction_log, position)
+            self._product_indexes = {}
+            self._category_index = None
+            self._search_index = None
+            self._suggest_index = None
+            self._aggregates = None
+            self._replay_transactions(records)
+            return records
+    
+    def _replay_transactions(self, records):
+        """Apply transactions logged after the products snapshot to the cached records"""
+        with self._reading_log():
+            for transaction_data in self._products_reader.read():
+                product_data = records.get(transaction_data['product_id'])
+                tracked = self._maintained_indexes() or self._aggregates is not None
+                old = dict(product_data) if product_data and tracked else None
+                self._apply_transaction(records, transaction_data)
+                if old:
+                    self._product_changed(transaction_data['product_id'], old, product_data)
+    
+    def _maintained_indexes(self):
+        """Get the product indexes built so far, which every product change must update"""
+        indexes = list(self._product_indexes.values())
+        indexes.extend(index for index in (self._category_index, self._search_index, self._suggest_index)
+                       if index is not None)
+        return indexes
+    
+    def _product_changed(self, product_id, old, new):
+        """Keep the product indexes and inventory totals current
+        
+        old or new is None for an added or deleted product.
+        """
+        if self._aggregates is not None:
+            if old is not None:
+                self._aggregates.remove(old)
+            if new is not None:
+                self._aggregates.add(new)
+        
+        for index in self._maintained_indexes():
+            if old is None:
+                index.add(product_id, new)
+            elif new is None:
+                index.remove(product_id, old)
+            else:
+                index.update(product_id, old, new)
+    
+    @staticmethod
+    def _apply_transaction(records, transaction_data):
+        """Apply the quantity change of a transaction record to the product records"""
+        product_data = records.get(transaction_data['product_id'])
+        if not product_data:
+            return
+        
+        if transaction_data['transaction_type'] == "IN":
+            product_data['quantity'] += transaction_data['quantity']
+        elif transaction_data['transaction_type'] == "OUT":
+            product_data['quantity'] -= transaction_data['quantity']
+        
+        # Stock movements change the record, so they count as a new version
+        product_data['version'] = product_data.get('version', 0) + 1
+    
+    def _snapshot_data(self, file_path, records):
+        """Get the JSON document to write for the cached records of a file"""
+        if file_path != self.products_file:
+            return list(records.values())
+        
+        # Products are a checkpoint: the snapshot plus the log position it reflects
+        self._replay_transactions(records)
+        position = dict(self._products_reader.position)
+        
+        # Records are appended outside the background writer, so some may
+        # not have been fsynced yet. Sync the partitions that grew since the
+        # last checkpoint so this one never gets ahead of the log on disk.
+        previous = self._checkpoint_position or {}
+        self.transaction_log.sync(name for name, offset in position.items() if offset != previous.get(name))
+        self._checkpoint_position = position
+        return {
+            'transactions_positions': position,
+            'products': list(records.values())
+        }
+    
+    @contextmanager
+    def _exclusive(self):
+        """Hold the in-process and cross-process locks for a read-modify-write
+        
+        Loads inside the block see every change other processes have made, and
+        no other process can change the files until the block ends.
+        """
+        with self._lock, self.file_lock.exclusive():
+            yield
+    
+    @contextmanager
+    def _reading_log(self):
+        """Hold the cross-process lock in shared mode while catching up with the transaction log
+        
+        Batches are appended under the exclusive lock, so a reader never sees
+        one half-written; a batch left part-written by a crashed writer is
+        rolled back before reading.
+        """
+        with self.file_lock.shared():
+            if self.transaction_log.has_unfinished_batch():
+                with self.file_lock.exclusive():
+                    self.transaction_log.recover()
+            yield
+    
+    def _save_data(self, file_path, records):
+        """Write records through the cache and save them to disk before returning"""
+        with self._exclusive():
+            cached = self._cache.get(file_path)
+            self._cache[file_path] = (cached[0] if cached else None, records)
+            self._write_file(file_path)
+    
+    def _write_file(self, file_path):
+        """Atomically write the cached records of a file to disk"""
+        with self._exclusive():
+            records = self._cache[file_path][1]
+            document = self._snapshot_data(file_path, records)
+            data = json.dumps(document, indent=2)
+            
+            try:
+                atomic_write(file_path, data)
+                
+                # Bump the stored generation so other processes notice the change
+                # even when mtime and size alone would not tell them apart
+                generations = self._bump_generation(os.path.basename(file_path))
+                signature = self._get_signature(file_path, generations)
+                self._cache[file_path] = (signature, records)
+                
+                if config.SNAPSHOT_CACHE and signature:
+                    self._save_snapshot(file_path, data.encode(), signature[0], document)
+            except Exception:
+                # Fall back to whatever is on disk rather than serving unsaved records
+                self._cache.pop(file_path, None)
+                raise
     
-    def _save_data(self, file_path, data):
-        """Save data to a JSON file"""
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=2)
+    def _write_checkpoint(self):
+        """Write the current product state as a checkpoint (runs on the writer thread)"""
+        with self._exclusive():
+            # Load first: another process may have rewritten the file since
+            self._load_products()
+            self._write_file(self.products_file)
+    
+    def commit(self):
+        """Get a future that resolves once every change made so far is durable on disk"""
+        return self.writer.barrier()
+    
+    def checkpoint(self):
+        """Snapshot product state with the log position it reflects so startup only replays the tail
+        
+        Returns a future that resolves once the snapshot is on disk.
+        """
+        with self._lock:
+            self._since_checkpoint = 0
+            with self._reading_log(), self._transactions_lock:
+                # Bring the per-product index up to date with the log as well
+                self.transaction_index.update()
+                self.transaction_index.save()
+        
+        return self.writer.submit(self.products_file, self._write_checkpoint)
     
     # Product operations
     def get_all_products(self):
-        """Get all products"""
-        products_data = self._load_data(self.products_file)
-        return [Product.from_dict(p) for p in products_data]
+        """Get read-only views of all products"""
+        # Listed under the lock: the cached dict changes size when another thread writes
+        with self._lock:
+            products_data = self._load_products()
+            return [ProductView(p) for p in products_data.values()]
+    
+    def get_products_page(self, limit=None, cursor=None, sort='name'):
+        """Get a page of product views in sort order and the cursor of the next page (None on the last)
+        
+        sort is a field name, prefixed with '-' for descending order. Pages are
+        sliced from a sorted index, so each costs the same however far in it is.
+        """
+        field, descending = parse_sort(sort, PRODUCT_SORT_FIELDS)
+        # Index entries are (value, product_id)
+        after = decode_cursor(cursor, sort, (SORT_FIELD_TYPES[field], str)) if cursor else None
+        
+        with self._lock:
+            products_data = self._load_products()
+            index = self._product_index(field, products_data)
+            entries, more = page_entries(index.entries, limit, after, descending)
+            products = [ProductView(products_data[product_id]) for _, product_id in entries]
+        
+        return products, encode_cursor(sort, entries[-1]) if more else None
+    
+    def _product_index(self, field, products_data):
+        """Get the sort index of the cached products on a field, building it on first use"""
+        index = self._product_indexes.get(field)
+        if index is None:
+            index = self._product_indexes[field] = SortedIndex(field, products_data)
+        return index
+    
+    def _products_by_category(self, products_data):
+        """Get the category index of the cached products, building it on first use"""
+        if self._category_index is None:
+            self._category_index = GroupIndex('category', products_data)
+        return self._category_index
+    
+    def get_products_by_category(self, category_id):
+        """Get views of the products in a category, looked up in the category index"""
+        with self._lock:
+            products_data = self._load_products()
+            product_ids = self._products_by_category(products_data).get(category_id)
+            return [ProductView(products_data[product_id]) for product_id in product_ids]
+    
+    def count_products_by_category(self):
+        """Get the number of products in each category (category ID -> count)"""
+        with self._lock:
+            return self._products_by_category(self._load_products()).counts()
+    
+    def get_low_stock_products(self, threshold):
+        """Get views of the products with at most threshold units in stock, lowest stock first
+        
+        Served from the quantity index, so the cost depends on the number of
+        matching products rather than on the size of the inventory.
+        """
+        with self._lock:
+            products_data = self._load_products()
+            entries = self._product_index('quantity', products_data).at_most(threshold)
+            return [ProductView(products_data[product_id]) for _, product_id in entries]
+    
+    def search_products(self, query):
+        """Get views of the products whose name or description contains every term of the query, best first"""
+        with self._lock:
+            products_data = self._load_products()
+            if self._search_index is None:
+                self._search_index = TextIndex(('name', 'description'), products_data)
+            return [ProductView(products_data[product_id]) for product_id in self._search_index.search(query)]
+    
+    def suggest_products(self, prefix, limit=10):
+        """Get views of up to limit products with a word of their name starting with prefix"""
+        with self._lock:
+            products_data = self._load_products()
+            if self._suggest_index is None:
+                self._suggest_index = PrefixIndex('name', products_data)
+            return [ProductView(products_data[product_id])
+                    for product_id in self._suggest_index.complete(prefix, limit)]
+    
+    def get_inventory_summary(self):
+        """Get inventory totals (overall, per category and low-stock count) without scanning products"""
+        with self._lock:
+            products_data = self._load_products()
+            if self._aggregates is None:
+                self._aggregates = InventoryAggregates(config.LOW_STOCK_THRESHOLD, products_data.values())
+            return self._aggregates.summary()
+    
+    def rebuild_inventory_summary(self):
+        """Recompute the inventory totals from a full scan of the products"""
+        with self._lock:
+            products_data = self._load_products()
+            self._aggregates = InventoryAggregates(config.LOW_STOCK_THRESHOLD, products_data.values())
+            return self._aggregates.summary()
+    
+    def verify_inventory_summary(self):
+        """Check the inventory totals against a full scan; returns the names of totals that differ"""
+        with self._lock:
+            products_data = self._load_products()
+            if self._aggregates is None:
+                return []
+            return self._aggregates.verify(products_data.values())
     
     def get_product_by_id(self, product_id):
         """Get a product by ID"""
-        products_data = self._load_data(self.products_file)
-        for product_data in products_data:
-            if product_data['product_id'] == product_id:
-                return Product.from_dict(product_data)
-        return None
+        products_data = self._load_products()
+        product_data = products_data.get(product_id)
+        return Product.from_dict(product_data) if product_data else None
     
     def add_product(self, product):
         """Add a new product"""
-        products_data = self._load_data(self.products_file)
-        
-        # Check if product ID already exists
-        for p in products_data:
-            if p['product_id'] == product.product_id:
-                raise ValueError(f"Product with ID {product.product_id} already exists")
-        
-        products_data.append(product.to_dict())
-        self._save_data(self.products_file, products_data)
-        return product
+        return self.add_products([product])[0]
+    
+    def add_products(self, products):
+        """Add several new products with a single save; either all are added or none"""
+        with self._exclusive():
+            products_data = self._load_products()
+            
+            # Validate the whole batch before touching the cached records
+            new_ids = set()
+            for product in products:
+                if product.product_id in products_data or product.product_id in new_ids:
+                    raise ValueError(f"Product with ID {product.product_id} already exists")
+                new_ids.add(product.product_id)
+            
+            if not products:
+                return products
+            
+            for product in products:
+                products_data[product.product_id] = product.to_dict()
+                self._product_changed(product.product_id, None, products_data[product.product_id])
+            self._save_data(self.products_file, products_data)
+            return products
     
     def update_product(self, product):
-        """Update an existing product"""
-        products_data = self._load_data(self.products_file)
+        """Update an existing product, provided it is still at the version it was read at
         
-        for i, p in enumerate(products_data):
-            if p['product_id'] == product.product_id:
-                products_data[i] = product.to_dict()
-                self._save_data(self.products_file, products_data)
-                return product
-        
-        raise ValueError(f"Product with ID {product.product_id} not found")
+        Raises VersionConflictError if the product changed since it was read.
+        """
+        with self._exclusive():
+            products_data = self._load_products()
+            
+            current = products_data.get(product.product_id)
+            if not current:
+                raise ValueError(f"Product with ID {product.product_id} not found")
+            if current.get('version', 0) != product.version:
+                raise VersionConflictError(f"Product with ID {product.product_id} was changed by someone else")
+            
+            product.version += 1
+            products_data[product.product_id] = product.to_dict()
+            self._product_changed(product.product_id, current, products_data[product.product_id])
+            self._save_data(self.products_file, products_data)
+            return product
     
     def delete_product(self, product_id):
         """Delete a product by ID"""
-        products_data = self._load_data(self.products_file)
-        
-        for i, p in enumerate(products_data):
-            if p['product_id'] == product_id:
-                del products_data[i]
-                self._save_data(self.products_file, products_data)
-                return True
-        
-        return False
+        with self._exclusive():
+            products_data = self._load_products()
+            
+            if product_id not in products_data:
+                return False
+            
+            self._product_changed(product_id, products_data.pop(product_id), None)
+            self._save_data(self.products_file, products_data)
+            return True
     
     # Category operations
     def get_all_categories(self):
-        """Get all categories"""
-        categories_data = self._load_data(self.categories_file)
-        return [Category.from_dict(c) for c in categories_data]
+        """Get read-only views of all categories"""
+        with self._lock:
+            categories_data = self._load_data(self.categories_file, 'category_id')
+            return [CategoryView(c) for c in categories_data.values()]
+    
+    def suggest_categories(self, prefix, limit=10):
+        """Get views of up to limit categories with a word of their name starting with prefix"""
+        with self._lock:
+            categories_data = self._load_data(self.categories_file, 'category_id')
+            
+            # Every load or write of the categories replaces their cache entry,
+            # so the index is rebuilt exactly when the categories have changed
+            entry = self._cache.get(self.categories_file)
+            if self._category_suggest is None or self._category_suggest[0] is not entry:
+                self._category_suggest = (entry, PrefixIndex('name', categories_data))
+            return [CategoryView(categories_data[category_id])
+                    for category_id in self._category_suggest[1].complete(prefix, limit)]
     
     def get_category_by_id(self, category_id):
         """Get a category by ID"""
-        categories_data = self._load_data(self.categories_file)
-        for category_data in categories_data:
-            if category_data['category_id'] == category_id:
-                return Category.from_dict(category_data)
-        return None
+        categories_data = self._load_data(self.categories_file, 'category_id')
+        category_data = categories_data.get(category_id)
+        return Category.from_dict(category_data) if category_data else None
     
     def add_category(self, category):
         """Add a new category"""
-        categories_data = self._load_data(self.categories_file)
-        
-        # Check if category ID already exists
-        for c in categories_data:
-            if c['category_id'] == category.category_id:
+        with self._exclusive():
+            categories_data = self._load_data(self.categories_file, 'category_id')
+            
+            # Check if category ID already exists
+            if category.category_id in categories_data:
                 raise ValueError(f"Category with ID {category.category_id} already exists")
-        
-        categories_data.append(category.to_dict())
-        self._save_data(self.categories_file, categories_data)
-        return category
+            
+            categories_data[category.category_id] = category.to_dict()
+            self._save_data(self.categories_file, categories_data)
+            return category
     
     def update_category(self, category):
         """Update an existing category"""
-        categories_data = self._load_data(self.categories_file)
-        
-        for i, c in enumerate(categories_data):
-            if c['category_id'] == category.category_id:
-                categories_data[i] = category.to_dict()
-                self._save_data(self.categories_file, categories_data)
-                return category
-        
-        raise ValueError(f"Category with ID {category.category_id} not found")
+        with self._exclusive():
+            categories_data = self._load_data(self.categories_file, 'category_id')
+            
+            if category.category_id not in categories_data:
+                raise ValueError(f"Category with ID {category.category_id} not found")
+            
+            categories_data[category.category_id] = category.to_dict()
+            self._save_data(self.categories_file, categories_data)
+            return category
     
     def delete_category(self, category_id):
-        """Delete a category by ID"""
-        categories_data = self._load_data(self.categories_file)
-        
-        for i, c in enumerate(categories_data):
-            if c['category_id'] == category_id:
-                del categories_data[i]
-                self._save_data(self.categories_file, categories_data)
-                return True
+        """Delete a category by ID
         
-        return False
+        Raises ValueError if products still belong to the category.
+        """
+        with self._exclusive():
+            categories_data = self._load_data(self.categories_file, 'category_id')
+            
+            if category_id not in categories_data:
+                return False
+            
+            in_use = self._products_by_category(self._load_products()).count(category_id)
+            if in_use:
+                raise ValueError(f"Category with ID {category_id} still has {in_use} product(s)")
+            
+            del categories_data[category_id]
+            self._save_data(self.categories_file, categories_data)
+            return True
     
     # Transaction operations
+    def _load_transactions(self):
+        """Load transaction records, reading only what was appended since the last call"""
+        with self._reading_log(), self._transactions_lock:
+            if self._transactions_reader is None or self._transactions_reader.was_truncated():
+                # First read, or the log was replaced or truncated: start over
+                self._transactions = []
+                self._transactions_reader = LogReader(self.transaction_log)
+            
+            self._transactions.extend(self._transactions_reader.read())
+            
+            return self._transactions
+    
+    def get_transaction_columns(self):
+        """Get the columnar analytics copy of the transaction history, caught up with the log"""
+        # Imported here to keep NumPy out of the start-up of commands that never need it
+        from .analytics import TransactionColumns
+        
+        with self._reading_log(), self._transactions_lock:
+            if self._columns is None or self._columns_reader.was_truncated():
+                self._columns = TransactionColumns()
+                self._columns_reader = LogReader(self.transaction_log)
+            
+            self._columns.extend(self._columns_reader.read())
+            
+            return self._columns
+    
     def get_all_transactions(self):
-        """Get all transactions"""
-        transactions_data = self._load_data(self.transactions_file)
-        return [Transaction.from_dict(t) for t in transactions_data]
+        """Get read-only views of all transactions"""
+        transactions_data = self._load_transactions()
+        return [TransactionView(t) for t in transactions_data]
     
-    def add_transaction(self, transaction):
-        """Add a new transaction and update product quantity"""
-        transactions_data = self._load_data(self.transactions_file)
+    def iter_transactions(self, product_id=None, since=None, until=None):
+        """Stream transactions from the log, optionally filtered by product and time range"""
+        since = format_timestamp(since)
+        until = format_timestamp(until)
         
-        # Update product quantity
-        product = self.get_product_by_id(transaction.product_id)
-        if not product:
-            raise ValueError(f"Product with ID {transaction.product_id} not found")
+        if product_id:
+            records = self._iter_product_records(product_id, since, until)
+        else:
+            # Only partitions overlapping the time range are read
+            records = self.transaction_log.iter_records(since, until)
         
-        if transaction.transaction_type == "IN":
-            product.quantity += transaction.quantity
-        elif transaction.transaction_type == "OUT":
-            if product.quantity < transaction.quantity:
-                raise ValueError(f"Insufficient stock for product {product.name}")
-            product.quantity -= transaction.quantity
+        # Records are filtered before a Transaction is built
+        for transaction_data in records:
+            timestamp = format_timestamp(transaction_data['timestamp'])
+            if (since and timestamp < since) or (until and timestamp > until):
+                continue
+            yield TransactionView(transaction_data)
+    
+    def get_transactions_page(self, limit=None, cursor=None, sort='timestamp', product_id=None, since=None, until=None):
+        """Get a page of transaction views in time order and the cursor of the next page (None on the last)
         
-        # Update product in database
-        self.update_product(product)
+        Pages are sliced from an in-memory time index over the log and read
+        from it by offset, so each costs the same however far in it is.
+        """
+        parse_sort(sort, TRANSACTION_SORT_FIELDS)
+        # Index entries are (timestamp, partition, offset)
+        after = decode_cursor(cursor, sort, (str, str, int)) if cursor else None
         
-        # Add transaction
-        transactions_data.append(transaction.to_dict())
-        self._save_data(self.transactions_file, transactions_data)
+        with self._reading_log(), self._transactions_lock:
+            self.transaction_time_index.update()
+            entries, more = self.transaction_time_index.page(
+                product_id, since, until, limit, after, descending=sort.startswith('-'))
         
-        return transaction 
\ No newline at end of file
+        transactions = [TransactionView(t) for t in self.transaction_time_index.read(entries)]
+        return transactions, encode_cursor(sort, entries[-1]) if more else None
+    
+    def _iter_product_records(self, product_id, since=None, until=None):
+        """Stream the log records of one product, read directly at the offsets the index holds for it"""
+        with self._reading_log(), self._transactions_lock:
+            located = self.transaction_index.lookup(product_id, since, until)
+            # A save only appends the offsets indexed since the last one
+            if self.transaction_index.unsaved() >= config.CHECKPOINT_INTERVAL:
+                self.transaction_index.save()
+        
+        for name, offsets in located:
+            for transaction_data in self.transaction_log.read_at(name, offsets):
+                yield transaction_data
+    
+    def add_transaction(self, transaction):
+        """Add a new transaction and update product quantity"""
+        return self.add_transactions([transaction])[0]
+    
+    def add_transactions(self, transactions):
+        """Add several transactions in order with a single log write; either all are committed or none
+        
+        The stock check and the append hold the exclusive lock, which serializes
+        them with every other write to the data directory; only the records are
+        prepared before it and the fsync waited for after it.
+        """
+        if not transactions:
+            return transactions
+        records = [t.to_dict() for t in transactions]
+        
+        with self._exclusive():
+            products_data = self._load_products()
+            
+            # Check the batch against copies so a failed batch leaves the cache untouched
+            updated = {}
+            for record in records:
+                product_id = record['product_id']
+                product_data = updated.get(product_id) or products_data.get(product_id)
+                if not product_data:
+                    raise ValueError(f"Product with ID {product_id} not found")
+                product_data = updated.setdefault(product_id, dict(product_data))
+                
+                if record['transaction_type'] == "OUT" and product_data['quantity'] < record['quantity']:
+                    raise ValueError(f"Insufficient stock for product {product_data['name']}")
+                self._apply_transaction(updated, record)
+            
+            # Only the log is written; products.json is refreshed by checkpoints.
+            # The records are in the log once append_many returns, so the
+            # cached products pick them up like any other logged transaction.
+            logged = self.transaction_log.append_many(records)
+            self._replay_transactions(products_data)
+            
+            self._since_checkpoint += len(transactions)
+            if self._since_checkpoint >= config.CHECKPOINT_INTERVAL:
+                self.checkpoint()
+        
+        # Wait for the fsync outside the locks so concurrent callers can share it
+        logged.result()
+        return transactions
+
+
+# One storage instance per backend and data directory, so every manager in a
+# process shares the same cache and sees writes the background writer has not
+# flushed yet. The lock is re-entrant because the SQLite backend gets the
+# JSON one to import its data while being created
+_instances = {}
+_instances_lock = threading.RLock()
+
+
+def create_database(data_dir, backend=None):
+    """Get the storage backend selected by configuration for a data directory"""
+    backend = backend or config.STORAGE_BACKEND
+    key = (backend, os.path.abspath(data_dir))
+    with _instances_lock:
+        db = _instances.get(key)
+        if db is None:
+            if backend == 'json':
+                db = Database(data_dir)
+            elif backend == 'sqlite':
+                from .sqlite_database import SQLiteDatabase
+                db = SQLiteDatabase(data_dir)
+            else:
+                raise ValueError(f"Unknown storage backend: {backend}")
+            _instances[key] = db
+    return db
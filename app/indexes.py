@@ -0,0 +1,364 @@
+import base64
+import json
+import re
+from bisect import bisect_left, bisect_right, insort
+from itertools import groupby
+from .models import format_timestamp
+from .transaction_log import LogReader
+
+# Fields products can be sorted by; prefix with '-' for descending order
+PRODUCT_SORT_FIELDS = ('name', 'price', 'quantity', 'product_id')
+
+# Fields transactions can be sorted by
+TRANSACTION_SORT_FIELDS = ('timestamp',)
+
+# Type of the values of each sort field, which cursors are checked against
+SORT_FIELD_TYPES = {'name': str, 'price': (int, float), 'quantity': int, 'product_id': str, 'timestamp': str}
+
+# Entries read from the log in one go beyond which the index is re-sorted instead of inserted into
+_BULK_INSERT = 1000
+
+# Words of a text field, as matched whole by search terms
+_WORD = re.compile(r'\w+')
+
+# Sorts after every partition name, so (timestamp, _LAST) follows all entries at that timestamp
+_LAST = '\U0010ffff'
+
+
+def parse_sort(sort, fields):
+    """Split a sort parameter such as '-price' into (field, descending)"""
+    field = sort.lstrip('-')
+    if field not in fields:
+        raise ValueError(f"Cannot sort by {field!r}; choose one of {', '.join(fields)}")
+    return field, sort.startswith('-')
+
+
+def encode_cursor(sort, entry):
+    """Encode the sort key of the last item on a page as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps([sort] + list(entry)).encode()).decode()
+
+
+def decode_cursor(cursor, sort, types):
+    """Get the sort key a cursor continues after; it must come from a page with the same sort
+
+    types gives the type of each part of the key, so a crafted cursor fails
+    here rather than when compared against the index.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or not values or values[0] != sort:
+        raise ValueError("Cursor does not belong to this sort order")
+    key = values[1:]
+    if len(key) != len(types) or not all(isinstance(value, kind) and not isinstance(value, bool)
+                                         for value, kind in zip(key, types)):
+        raise ValueError("Invalid cursor")
+    return tuple(key)
+
+
+def page_entries(entries, limit=None, after=None, descending=False, lo=0, hi=None):
+    """Slice a page from a sorted list of entries, continuing after the given entry
+
+    Only entries within entries[lo:hi] are considered. Returns the page (in
+    the requested direction) and whether more entries follow it.
+    """
+    hi = len(entries) if hi is None else hi
+    if descending:
+        if after is not None:
+            hi = min(hi, bisect_left(entries, after))
+        start = lo if limit is None else max(lo, hi - limit)
+        return entries[start:hi][::-1], start > lo
+
+    if after is not None:
+        lo = max(lo, bisect_right(entries, after))
+    end = hi if limit is None else max(lo, min(hi, lo + limit))
+    return entries[lo:end], end < hi
+
+
+class SortedIndex:
+    """Records ordered by one field, as a sorted list of (value, record ID) entries
+
+    Finding a page costs a bisection plus the page itself, however many
+    records there are. The owner keeps it current with add() and remove().
+    """
+
+    def __init__(self, field, records):
+        self.field = field
+        self.entries = sorted((record[field], record_id) for record_id, record in records.items())
+
+    def add(self, record_id, record):
+        insort(self.entries, (record[self.field], record_id))
+
+    def remove(self, record_id, record):
+        entry = (record[self.field], record_id)
+        i = bisect_left(self.entries, entry)
+        if i < len(self.entries) and self.entries[i] == entry:
+            del self.entries[i]
+
+    def update(self, record_id, old, new):
+        """Move a record whose field may have changed from old to new"""
+        if old[self.field] != new[self.field]:
+            self.remove(record_id, old)
+            self.add(record_id, new)
+
+    def at_most(self, value):
+        """Get the entries whose field is at most value, in order, at the cost of one bisection"""
+        return self.entries[:bisect_right(self.entries, (value, _LAST))]
+
+
+class TransactionTimeIndex:
+    """Log entries ordered by transaction time, overall and per product
+
+    Entries are (timestamp, partition, offset) tuples pointing into the
+    TransactionLog. The index is built on first use and catches up by reading
+    only the records appended since.
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self._reader = None
+        self._all = []
+        self._by_product = {}
+
+    def update(self):
+        """Index records appended to the log since the last update"""
+        if self._reader is None or self._reader.was_truncated():
+            self._reader = LogReader(self.log)
+            self._all = []
+            self._by_product = {}
+
+        new_entries = []
+        by_product = {}
+        for name, offset, record in self._reader.read_entries():
+            entry = (format_timestamp(record['timestamp']), name, offset)
+            new_entries.append(entry)
+            by_product.setdefault(record['product_id'], []).append(entry)
+
+        self._merge(self._all, new_entries)
+        for product_id, entries in by_product.items():
+            self._merge(self._by_product.setdefault(product_id, []), entries)
+
+    @staticmethod
+    def _merge(target, entries):
+        # New records are mostly the latest, so inserting them one at a time
+        # is cheap; a large batch is cheaper to sort in
+        if len(entries) > _BULK_INSERT:
+            target.extend(entries)
+            target.sort()
+        else:
+            for entry in entries:
+                insort(target, entry)
+
+    def page(self, product_id=None, since=None, until=None, limit=None, after=None, descending=False):
+        """Get a page of (timestamp, partition, offset) entries and whether more follow"""
+        entries = self._by_product.get(product_id, []) if product_id else self._all
+        lo = bisect_left(entries, (format_timestamp(since),)) if since else 0
+        hi = bisect_right(entries, (format_timestamp(until), _LAST)) if until else len(entries)
+        return page_entries(entries, limit, after, descending, lo, hi)
+
+    def read(self, entries):
+        """Read the log records the given entries point to, in order"""
+        for name, group in groupby(entries, key=lambda entry: entry[1]):
+            for record in self.log.read_at(name, [entry[2] for entry in group]):
+                yield record
+
+
+class GroupIndex:
+    """Records grouped by the value of one field, as value -> IDs of the records holding it
+
+    The IDs are kept as dict keys (an insertion-ordered set), so a group is
+    listed in the order its records joined it.
+    """
+
+    def __init__(self, field, records):
+        self.field = field
+        self.groups = {}
+        for record_id, record in records.items():
+            self.add(record_id, record)
+
+    def add(self, record_id, record):
+        self.groups.setdefault(record.get(self.field), {})[record_id] = None
+
+    def remove(self, record_id, record):
+        group = self.groups.get(record.get(self.field))
+        if group is not None:
+            group.pop(record_id, None)
+            if not group:
+                del self.groups[record.get(self.field)]
+
+    def update(self, record_id, old, new):
+        """Move a record whose field may have changed from old to new"""
+        if old.get(self.field) != new.get(self.field):
+            self.remove(record_id, old)
+            self.add(record_id, new)
+
+    def get(self, value):
+        """Get the IDs of the records whose field holds value"""
+        return list(self.groups.get(value, ()))
+
+    def count(self, value):
+        return len(self.groups.get(value, ()))
+
+    def counts(self):
+        """Get the number of records per value"""
+        return {value: len(group) for value, group in self.groups.items()}
+
+
+class PrefixIndex:
+    """Records keyed by the words of a text field, for completing what a user has typed so far
+
+    Holds a (text, record ID) entry for every word start in the lowercased
+    field, so 'Blue Widget' is found from 'blu', 'blue w' and 'wid'. The
+    entries are a sorted list in which those starting with a prefix form one
+    run, found by bisection.
+    """
+
+    def __init__(self, field, records):
+        self.field = field
+        self.entries = sorted(entry for record_id, record in records.items()
+                              for entry in self._entries(record_id, record))
+
+    def _entries(self, record_id, record):
+        text = ' '.join((record.get(self.field) or '').lower().split())
+        return [(text[match.start():], record_id) for match in _WORD.finditer(text)]
+
+    def add(self, record_id, record):
+        for entry in self._entries(record_id, record):
+            insort(self.entries, entry)
+
+    def remove(self, record_id, record):
+        for entry in self._entries(record_id, record):
+            i = bisect_left(self.entries, entry)
+            if i < len(self.entries) and self.entries[i] == entry:
+                del self.entries[i]
+
+    def update(self, record_id, old, new):
+        """Re-index a record whose field may have changed from old to new"""
+        if old.get(self.field) != new.get(self.field):
+            self.remove(record_id, old)
+            self.add(record_id, new)
+
+    def complete(self, prefix, limit=10):
+        """Get the IDs of up to limit records with a word starting with prefix, in order of the matched text"""
+        prefix = ' '.join(prefix.lower().split())
+        if not prefix:
+            return []
+
+        found = []
+        i = bisect_left(self.entries, (prefix,))
+        while i < len(self.entries) and len(found) < limit and self.entries[i][0].startswith(prefix):
+            record_id = self.entries[i][1]
+            if record_id not in found:
+                found.append(record_id)
+            i += 1
+        return found
+
+
+class TextIndex:
+    """Inverted indexes over the text fields of records, for substring and multi-term search
+
+    Every trigram (three-character substring) of a field maps to the records
+    containing it, and every word to the records containing it whole. A term
+    is looked up by intersecting the records of its trigrams and checking
+    the few candidates left; terms too short to have a trigram are checked
+    against the lowercased fields the index keeps, so nothing is lowercased
+    per query. Matches are ranked by how well they match (see _score).
+    """
+
+    def __init__(self, fields, records):
+        self.fields = fields
+        self._texts = {}     # record ID -> lowercased field values
+        self._grams = {}     # trigram -> record IDs
+        self._words = {}     # word -> record IDs
+        for record_id, record in records.items():
+            self.add(record_id, record)
+
+    @staticmethod
+    def _keys(texts):
+        grams = set()
+        words = set()
+        for text in texts:
+            grams.update(text[i:i + 3] for i in range(len(text) - 2))
+            words.update(_WORD.findall(text))
+        return grams, words
+
+    def add(self, record_id, record):
+        texts = tuple((record.get(field) or '').lower() for field in self.fields)
+        self._texts[record_id] = texts
+        grams, words = self._keys(texts)
+        for gram in grams:
+            self._grams.setdefault(gram, set()).add(record_id)
+        for word in words:
+            self._words.setdefault(word, set()).add(record_id)
+
+    def remove(self, record_id, record):
+        texts = self._texts.pop(record_id, None)
+        if texts is None:
+            return
+        grams, words = self._keys(texts)
+        for postings, keys in ((self._grams, grams), (self._words, words)):
+            for key in keys:
+                ids = postings[key]
+                ids.discard(record_id)
+                if not ids:
+                    del postings[key]
+
+    def update(self, record_id, old, new):
+        """Re-index a record whose text fields may have changed from old to new"""
+        if any(old.get(field) != new.get(field) for field in self.fields):
+            self.remove(record_id, old)
+            self.add(record_id, new)
+
+    def _matching(self, term, candidates=None):
+        """Get the IDs of records with term in one of their fields, optionally among candidates only"""
+        if len(term) >= 3:
+            postings = sorted((self._grams.get(term[i:i + 3], ()) for i in range(len(term) - 2)), key=len)
+            found = set(postings[0])
+            for ids in postings[1:]:
+                found &= ids
+            if candidates is not None:
+                found &= candidates
+            if len(term) == 3:
+                return found
+        else:
+            found = self._texts if candidates is None else candidates
+
+        # A trigram match does not prove the whole term is there, so check
+        return {record_id for record_id in found if any(term in text for text in self._texts[record_id])}
+
+    def _score(self, record_id, terms, phrase):
+        """Rate how well a record matches: whole words beat parts of words, earlier fields beat later ones"""
+        texts = self._texts[record_id]
+        score = 0
+        for term in terms:
+            if record_id in self._words.get(term, ()):
+                score += 4
+            for i, text in enumerate(texts):
+                if term in text:
+                    score += len(texts) - i + (1 if text.startswith(term) else 0)
+                    break
+        if len(terms) > 1 and any(phrase in text for text in texts):
+            score += len(terms)
+        return score
+
+    def search(self, query):
+        """Get the IDs of records containing every term of the query, best matches first
+
+        Terms are matched case-insensitively anywhere in any field; an empty
+        query matches every record, in index order.
+        """
+        terms = query.lower().split()
+        if not terms:
+            return list(self._texts)
+
+        # Longest terms first: they have the most trigrams and the fewest matches
+        matches = None
+        for term in sorted(set(terms), key=len, reverse=True):
+            matches = self._matching(term, matches)
+            if not matches:
+                return []
+
+        phrase = ' '.join(terms)
+        return sorted(matches, key=lambda record_id: (-self._score(record_id, terms, phrase),
+                                                      self._texts[record_id], record_id))
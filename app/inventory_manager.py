@@ -1,11 +1,12 @@
 import uuid
 from datetime import datetime
-from .database import Database
-from .models import Product, Category, Transaction
+from . import config
+from .database import create_database
+from .models import Product, Category, Transaction, VersionConflictError, format_timestamp, parse_time_bound
 
 class InventoryManager:
-    def __init__(self, data_dir):
-        self.db = Database(data_dir)
+    def __init__(self, data_dir, backend=None):
+        self.db = create_database(data_dir, backend)
     
     # Product management
     def add_product(self, name, description, price, quantity, category):
@@ -25,18 +26,46 @@ class InventoryManager:
         
         return self.db.add_product(product)
     
+    def add_products(self, products_data):
+        """Add several products at once; each item holds the add_product arguments"""
+        products = [
+            Product(
+                product_id=str(uuid.uuid4()),
+                name=data['name'],
+                description=data['description'],
+                price=data['price'],
+                quantity=data['quantity'],
+                category=data['category']
+            )
+            for data in products_data
+        ]
+        
+        return self.db.add_products(products)
+    
     def update_product(self, product_id, **kwargs):
-        """Update product details"""
-        product = self.db.get_product_by_id(product_id)
-        if not product:
-            raise ValueError(f"Product with ID {product_id} not found")
+        """Update product details
         
-        # Update product attributes
-        for key, value in kwargs.items():
-            if hasattr(product, key):
-                setattr(product, key, value)
+        If the product changes concurrently the update is re-applied to the
+        latest version. Passing version makes the update conditional on the
+        product still being at that version, without retrying.
+        """
+        attempts = 1 if 'version' in kwargs else config.UPDATE_RETRIES
         
-        return self.db.update_product(product)
+        for attempt in range(attempts):
+            product = self.db.get_product_by_id(product_id)
+            if not product:
+                raise ValueError(f"Product with ID {product_id} not found")
+            
+            # Update product attributes
+            for key, value in kwargs.items():
+                if hasattr(product, key):
+                    setattr(product, key, value)
+            
+            try:
+                return self.db.update_product(product)
+            except VersionConflictError:
+                if attempt == attempts - 1:
+                    raise
     
     def get_product(self, product_id):
         """Get product by ID"""
@@ -46,28 +75,59 @@ class InventoryManager:
         """Get all products"""
         return self.db.get_all_products()
     
+    def get_products_page(self, limit=None, cursor=None, sort='name'):
+        """Get a page of products and the cursor of the next page (None on the last page)
+        
+        sort is 'name', 'price', 'quantity' or 'product_id', prefixed with '-' for descending order.
+        """
+        return self.db.get_products_page(limit, cursor, sort)
+    
     def delete_product(self, product_id):
         """Delete a product"""
         return self.db.delete_product(product_id)
     
     def search_products(self, search_term):
-        """Search products by name or description"""
-        products = self.db.get_all_products()
-        search_term = search_term.lower()
+        """Search products by name or description
+        
+        Every word of the search term must appear (case-insensitively) in the
+        name or description; the best matches come first.
+        """
+        return self.db.search_products(search_term)
+    
+    def suggest(self, prefix, limit=10):
+        """Get up to limit categories and limit products whose name has a word starting with prefix
         
-        return [p for p in products if 
-                search_term in p.name.lower() or 
-                search_term in p.description.lower()]
+        Meant for type-ahead: answered from in-memory name indexes without
+        scanning the catalog.
+        """
+        return {
+            'categories': self.db.suggest_categories(prefix, limit),
+            'products': self.db.suggest_products(prefix, limit)
+        }
     
     def get_products_by_category(self, category_id):
         """Get all products in a specific category"""
-        products = self.db.get_all_products()
-        return [p for p in products if p.category == category_id]
+        return self.db.get_products_by_category(category_id)
+    
+    def count_products_by_category(self):
+        """Get the number of products in each category (category ID -> count)"""
+        return self.db.count_products_by_category()
     
     def get_low_stock_products(self, threshold=10):
-        """Get products with stock below threshold"""
-        products = self.db.get_all_products()
-        return [p for p in products if p.quantity <= threshold]
+        """Get products with stock below threshold, lowest stock first"""
+        return self.db.get_low_stock_products(threshold)
+    
+    def get_inventory_summary(self):
+        """Get inventory totals: product count, units and value overall and per category, and low-stock count"""
+        return self.db.get_inventory_summary()
+    
+    def rebuild_inventory_summary(self):
+        """Recompute the inventory totals from scratch"""
+        return self.db.rebuild_inventory_summary()
+    
+    def verify_inventory_summary(self):
+        """Check the inventory totals against a full scan; returns the names of totals that differ"""
+        return self.db.verify_inventory_summary()
     
     # Category management
     def add_category(self, name, description=None):
@@ -106,7 +166,7 @@ class InventoryManager:
         return self.db.get_all_categories()
     
     def delete_category(self, category_id):
-        """Delete a category"""
+        """Delete a category; raises ValueError while products still belong to it"""
         return self.db.delete_category(category_id)
     
     # Inventory transactions
@@ -140,6 +200,9 @@ class InventoryManager:
         if product.quantity < quantity:
             raise ValueError(f"Insufficient stock for product {product.name}")
         
+        # The storage checks the stock again under its write lock, so a
+        # concurrent removal that got in first cannot make this one oversell
+        
         # Generate transaction ID
         transaction_id = str(uuid.uuid4())
         
@@ -155,30 +218,56 @@ class InventoryManager:
         
         return self.db.add_transaction(transaction)
     
-    def get_transaction_history(self, product_id=None):
-        """Get transaction history, optionally filtered by product ID"""
-        transactions = self.db.get_all_transactions()
+    def get_transaction_history(self, product_id=None, since=None, until=None):
+        """Get transaction history, optionally filtered by product ID and time range"""
+        since = parse_time_bound(since)
+        until = parse_time_bound(until)
+        if product_id or since or until:
+            return list(self.db.iter_transactions(product_id, since, until))
         
-        if product_id:
-            return [t for t in transactions if t.product_id == product_id]
+        return self.db.get_all_transactions()
+    
+    def iter_transactions(self, product_id=None, since=None, until=None):
+        """Stream transaction history, optionally filtered by product ID and time range
         
-        return transactions
+        The time range is checked here, so an invalid bound raises ValueError
+        before anything is streamed.
+        """
+        return self.db.iter_transactions(product_id, parse_time_bound(since), parse_time_bound(until))
+    
+    def get_transactions_page(self, limit=None, cursor=None, sort='timestamp', product_id=None, since=None, until=None):
+        """Get a page of transaction history in time order ('-timestamp' for newest first) and the next page's cursor"""
+        return self.db.get_transactions_page(limit, cursor, sort, product_id,
+                                             parse_time_bound(since), parse_time_bound(until))
+        
+    def get_generation(self, collection):
+        """Get (generation, last modified time in ns) of 'products', 'categories' or 'transactions'
+        
+        The generation changes whenever the collection does, so it can tell
+        whether data a client already has is still current without loading it.
+        """
+        return self.db.get_generation(collection)
+    
+    def get_transaction_columns(self):
+        """Get the columnar, array-backed transaction history used for analytics"""
+        return self.db.get_transaction_columns()
         
     def get_transactions(self, product_id=None):
         """Alias for get_transaction_history for compatibility"""
         return self.get_transaction_history(product_id)
         
-    def add_transaction(self, product_id, quantity, transaction_type, note=None, user=None, timestamp=None):
-        """Add a transaction record directly"""
+    def _create_transaction(self, product_id, quantity, transaction_type, note=None, user=None, timestamp=None):
+        """Build a transaction record with a new ID"""
         # Generate transaction ID
         transaction_id = str(uuid.uuid4())
         
         # Use current time if no timestamp provided
         if timestamp is None:
             timestamp = datetime.now()
+        timestamp = format_timestamp(timestamp)
             
         # Create transaction record
-        transaction = Transaction(
+        return Transaction(
             transaction_id=transaction_id,
             product_id=product_id,
             quantity=quantity,
@@ -188,4 +277,12 @@ class InventoryManager:
             note=note
         )
         
-        return self.db.add_transaction(transaction) 
\ No newline at end of file
+    def add_transaction(self, product_id, quantity, transaction_type, note=None, user=None, timestamp=None):
+        """Add a transaction record directly"""
+        transaction = self._create_transaction(product_id, quantity, transaction_type, note, user, timestamp)
+        return self.db.add_transaction(transaction)
+    
+    def add_transactions(self, transactions_data):
+        """Add several transaction records at once; either the whole batch is recorded or none of it"""
+        transactions = [self._create_transaction(**data) for data in transactions_data]
+        return self.db.add_transactions(transactions)
\ No newline at end of file
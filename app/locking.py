@@ -0,0 +1,66 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # No cross-process locking (e.g. on Windows); threads are still serialized
+    fcntl = None
+
+
+class FileLock:
+    """Shared/exclusive lock between processes on a lock file, using fcntl.flock
+
+    Re-entrant within a process: a nested acquisition reuses the lock already
+    held, upgrading a shared lock to exclusive when needed, and a shared
+    request inside an exclusive one stays exclusive. Threads of one process
+    are serialized, since flock cannot tell them apart.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._thread_lock = threading.RLock()
+        self._fd = None
+        self._pid = None
+        self._modes = []
+
+    def _flock(self, exclusive):
+        if fcntl is None:
+            return
+
+        # A descriptor inherited across fork shares its lock with the parent,
+        # so every process opens its own
+        if self._fd is None or self._pid != os.getpid():
+            self._fd = os.open(self.file_path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+
+        if exclusive is None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+    @contextmanager
+    def _hold(self, exclusive):
+        with self._thread_lock:
+            held = self._modes[-1] if self._modes else None
+            mode = bool(exclusive or held)
+            if mode != held:
+                self._flock(mode)
+            self._modes.append(mode)
+
+            try:
+                yield
+            finally:
+                self._modes.pop()
+                previous = self._modes[-1] if self._modes else None
+                if previous != mode:
+                    self._flock(previous)
+
+    def shared(self):
+        """Hold the lock in shared mode (other processes may read, but not write)"""
+        return self._hold(False)
+
+    def exclusive(self):
+        """Hold the lock in exclusive mode (no other process may read or write)"""
+        return self._hold(True)
@@ -1,11 +1,21 @@
+from datetime import date, datetime, time
+
+
+class VersionConflictError(ValueError):
+    """Raised when a record was changed by someone else since it was read"""
+
+
 class Product:
-    def __init__(self, product_id, name, description, price, quantity, category):
+    __slots__ = ('product_id', 'name', 'description', 'price', 'quantity', 'category', 'version')
+    
+    def __init__(self, product_id, name, description, price, quantity, category, version=0):
         self.product_id = product_id
         self.name = name
         self.description = description
         self.price = price
         self.quantity = quantity
         self.category = category
+        self.version = version  # Incremented on every change, for optimistic concurrency
     
     def to_dict(self):
         return {
@@ -14,7 +24,8 @@ class Product:
             'description': self.description,
             'price': self.price,
             'quantity': self.quantity,
-            'category': self.category
+            'category': self.category,
+            'version': self.version
         }
     
     @classmethod
@@ -25,11 +36,14 @@ class Product:
             description=data['description'],
             price=data['price'],
             quantity=data['quantity'],
-            category=data['category']
+            category=data['category'],
+            version=data.get('version', 0)
         )
 
 
 class Category:
+    __slots__ = ('category_id', 'name', 'description')
+    
     def __init__(self, category_id, name, description=None):
         self.category_id = category_id
         self.name = name
@@ -51,6 +65,38 @@ class Category:
         )
 
 
+def format_timestamp(value):
+    """Convert a datetime to the ISO format string used for stored timestamps"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def parse_time_bound(value):
+    """Normalize a since/until bound to a timestamp string comparable with stored ones
+
+    Accepts datetimes, dates and ISO 8601 strings (a trailing Z included).
+    Stored timestamps are naive local times, so aware values are converted
+    to local time first. Returns None for an empty bound and raises
+    ValueError for anything that is not a date or time.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"Invalid date or time: {value!r}")
+    elif isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime.combine(value, time())
+    elif not isinstance(value, datetime):
+        raise ValueError(f"Invalid date or time: {value!r}")
+
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value.isoformat()
+
+
 # Define TransactionType enum
 class TransactionType:
     ADDITION = "IN"
@@ -58,6 +104,8 @@ class TransactionType:
 
 
 class Transaction:
+    __slots__ = ('transaction_id', 'product_id', 'quantity', 'transaction_type', 'timestamp', 'user', 'note')
+    
     def __init__(self, transaction_id, product_id, quantity, transaction_type, timestamp, user=None, note=None):
         self.transaction_id = transaction_id
         self.product_id = product_id
@@ -88,4 +136,66 @@ class Transaction:
             timestamp=data['timestamp'],
             user=data.get('user'),
             note=data.get('note')
-        ) 
\ No newline at end of file
+        ) 
+
+
+def _view_field(name, default=None):
+    return property(lambda view: view._record.get(name, default), doc=f"The record's {name}")
+
+
+class RecordView:
+    """Read-only view of a stored record that has the attributes of its model
+    
+    Attributes are read straight from the record dict, so handing out a view
+    copies nothing and the view follows the stored record as it changes.
+    Use to_model() for a copy that can be modified and saved.
+    """
+    __slots__ = ('_record',)
+    model = None
+    
+    def __init__(self, record):
+        object.__setattr__(self, '_record', record)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only; use to_model() for a copy that can be changed")
+    
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.model.__slots__}
+    
+    def to_model(self):
+        return self.model.from_dict(self._record)
+
+
+class ProductView(RecordView):
+    __slots__ = ()
+    model = Product
+    
+    product_id = _view_field('product_id')
+    name = _view_field('name')
+    description = _view_field('description')
+    price = _view_field('price')
+    quantity = _view_field('quantity')
+    category = _view_field('category')
+    version = _view_field('version', 0)
+
+
+class CategoryView(RecordView):
+    __slots__ = ()
+    model = Category
+    
+    category_id = _view_field('category_id')
+    name = _view_field('name')
+    description = _view_field('description')
+
+
+class TransactionView(RecordView):
+    __slots__ = ()
+    model = Transaction
+    
+    transaction_id = _view_field('transaction_id')
+    product_id = _view_field('product_id')
+    quantity = _view_field('quantity')
+    transaction_type = _view_field('transaction_type')
+    timestamp = _view_field('timestamp')
+    user = _view_field('user')
+    note = _view_field('note')
@@ -0,0 +1,42 @@
+import hashlib
+import os
+import pickle
+
+# Bumped whenever the layout of snapshot files changes
+FORMAT = 1
+
+
+def snapshot_path(file_path):
+    """Get the path of the binary snapshot kept next to a JSON data file"""
+    directory, name = os.path.split(file_path)
+    return os.path.join(directory, '.' + name + '.snapshot')
+
+
+def content_digest(content):
+    """Hash the raw bytes of a data file"""
+    return hashlib.blake2b(content, digest_size=16).digest()
+
+
+def dump_snapshot(content, mtime_ns, data):
+    """Serialize the parsed contents of a data file, keyed by its size, mtime and hash
+
+    content is the raw bytes of the file and data what it parses to. The
+    result is meant to be written to snapshot_path() of the file.
+    """
+    key = (FORMAT, len(content), mtime_ns, content_digest(content))
+    return pickle.dumps(key, pickle.HIGHEST_PROTOCOL) + pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+
+
+def load_snapshot(file_path, content, mtime_ns):
+    """Get the parsed contents of a data file from its snapshot, or None if it is missing or stale"""
+    try:
+        with open(snapshot_path(file_path), 'rb') as f:
+            key = pickle.load(f)
+            # Check the cheap parts of the key before hashing the file
+            if key[:3] != (FORMAT, len(content), mtime_ns) or key[3] != content_digest(content):
+                return None
+            return pickle.load(f)
+    except Exception:
+        # Unpickling a damaged or foreign snapshot can raise almost anything
+        # (missing modules or classes, truncated data); the JSON file is parsed instead
+        return None
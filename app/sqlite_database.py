@@ -0,0 +1,657 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from . import config
+from .aggregates import diff_summaries
+from .indexes import (PRODUCT_SORT_FIELDS, SORT_FIELD_TYPES, TRANSACTION_SORT_FIELDS, decode_cursor, encode_cursor,
+                      parse_sort)
+from .models import (Product, Category, ProductView, CategoryView, TransactionView,
+                     VersionConflictError, format_timestamp)
+from .writer import completed_future
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    category_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    product_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    price REAL NOT NULL,
+    quantity INTEGER NOT NULL,
+    category TEXT,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id TEXT PRIMARY KEY,
+    product_id TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    transaction_type TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    user TEXT,
+    note TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_product_timestamp
+    ON transactions (product_id, timestamp);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_timestamp
+    ON transactions (timestamp);
+
+CREATE INDEX IF NOT EXISTS idx_products_name ON products (name, product_id);
+CREATE INDEX IF NOT EXISTS idx_products_price ON products (price, product_id);
+CREATE INDEX IF NOT EXISTS idx_products_quantity ON products (quantity, product_id);
+CREATE INDEX IF NOT EXISTS idx_products_name_nocase ON products (name COLLATE NOCASE, product_id);
+CREATE INDEX IF NOT EXISTS idx_products_category ON products (category);
+"""
+
+# Stock value of a product row in whole cents, so the totals stay exact
+PRODUCT_CENTS = "CAST(ROUND({row}.price * 100) AS INTEGER) * {row}.quantity"
+
+# Per-category totals over the products table, kept current by triggers so
+# reading them needs no scan. Categories are matched with IS so products
+# without a category (NULL) are totalled too.
+AGGREGATES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS category_totals (
+    category TEXT,
+    count INTEGER NOT NULL,
+    units INTEGER NOT NULL,
+    cents INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_category_totals_category ON category_totals (category);
+
+CREATE TRIGGER IF NOT EXISTS products_totals_insert AFTER INSERT ON products BEGIN
+    {add_new}
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_totals_delete AFTER DELETE ON products BEGIN
+    {remove_old}
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_totals_update AFTER UPDATE OF price, quantity, category ON products BEGIN
+    {remove_old}
+    {add_new}
+END;
+""".format(
+    add_new="""
+    INSERT INTO category_totals (category, count, units, cents)
+        SELECT NEW.category, 0, 0, 0
+        WHERE NOT EXISTS (SELECT 1 FROM category_totals WHERE category IS NEW.category);
+    UPDATE category_totals
+        SET count = count + 1, units = units + NEW.quantity, cents = cents + {new_cents}
+        WHERE category IS NEW.category;""".format(new_cents=PRODUCT_CENTS.format(row='NEW')),
+    remove_old="""
+    UPDATE category_totals
+        SET count = count - 1, units = units - OLD.quantity, cents = cents - {old_cents}
+        WHERE category IS OLD.category;
+    DELETE FROM category_totals WHERE category IS OLD.category AND count = 0;""".format(
+        old_cents=PRODUCT_CENTS.format(row='OLD')))
+
+# Trigram full-text index over product names and descriptions (needs FTS5
+# and SQLite 3.34+), kept in step with the products table by triggers
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS products_search USING fts5(
+    name, description, content='products', content_rowid='rowid', tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS products_search_insert AFTER INSERT ON products BEGIN
+    INSERT INTO products_search (rowid, name, description) VALUES (NEW.rowid, NEW.name, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_search_delete AFTER DELETE ON products BEGIN
+    INSERT INTO products_search (products_search, rowid, name, description)
+        VALUES ('delete', OLD.rowid, OLD.name, OLD.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_search_update AFTER UPDATE OF name, description ON products BEGIN
+    INSERT INTO products_search (products_search, rowid, name, description)
+        VALUES ('delete', OLD.rowid, OLD.name, OLD.description);
+    INSERT INTO products_search (rowid, name, description) VALUES (NEW.rowid, NEW.name, NEW.description);
+END;
+"""
+
+# Generation counter and last modification time (Unix seconds) of each
+# table, bumped by triggers on every change so clients can poll cheaply
+GENERATIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    collection TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL,
+    modified REAL NOT NULL
+);
+""" + "".join("""
+INSERT OR IGNORE INTO generations (collection, generation, modified) VALUES ('{table}', 0, 0);
+""".format(table=table) + "".join("""
+CREATE TRIGGER IF NOT EXISTS {table}_generation_{name} AFTER {event} ON {table} BEGIN
+    UPDATE generations SET generation = generation + 1, modified = (julianday('now') - 2440587.5) * 86400
+        WHERE collection = '{table}';
+END;
+""".format(table=table, name=event.lower(), event=event) for event in ('INSERT', 'UPDATE', 'DELETE'))
+    for table in ('products', 'categories', 'transactions'))
+
+# The per-category totals computed by scanning every product
+SCAN_TOTALS = (f"SELECT category, COUNT(*) AS count, SUM(quantity) AS units, "
+               f"SUM({PRODUCT_CENTS.format(row='products')}) AS cents FROM products GROUP BY category")
+
+PRODUCT_COLUMNS = "product_id, name, description, price, quantity, category, version"
+CATEGORY_COLUMNS = "category_id, name, description"
+TRANSACTION_COLUMNS = "transaction_id, product_id, quantity, transaction_type, timestamp, user, note"
+
+# PRAGMA user_version of a database once the JSON data has been imported into it
+IMPORTED_VERSION = 1
+
+
+def _like_pattern(term, before='%', after='%'):
+    """Build a LIKE pattern (with \\ as escape character) matching term literally"""
+    return before + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + after
+
+
+class SQLiteDatabase:
+    """SQLite implementation of the Database API"""
+
+    def __init__(self, data_dir, filename=None):
+        self.data_dir = data_dir
+        self.db_file = os.path.join(data_dir, filename or config.SQLITE_FILENAME)
+
+        # sqlite3 connections may only be used by the thread that created them
+        self._local = threading.local()
+
+        # Columnar analytics copy of the transactions table and the last rowid it holds
+        self._columns = None
+        self._columns_rowid = 0
+        self._columns_lock = threading.Lock()
+
+        conn = self._get_connection()
+        conn.executescript(SCHEMA)
+
+        # Databases created before inventory totals were kept get them filled in once
+        has_totals = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'category_totals'").fetchone()
+        conn.executescript(AGGREGATES_SCHEMA)
+        conn.executescript(GENERATIONS_SCHEMA)
+        if not has_totals:
+            self.rebuild_inventory_summary()
+
+        # Without FTS5 trigram support searches fall back to scanning with LIKE
+        has_search = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_search'").fetchone()
+        try:
+            conn.executescript(SEARCH_SCHEMA)
+        except sqlite3.OperationalError:
+            self.full_text_search = False
+        else:
+            self.full_text_search = True
+            if not has_search:
+                conn.execute("INSERT INTO products_search (products_search) VALUES ('rebuild')")
+
+        # Databases created before products were versioned
+        columns = [row['name'] for row in conn.execute("PRAGMA table_info(products)")]
+        if 'version' not in columns:
+            conn.execute("ALTER TABLE products ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+        # Carry over any data from the JSON backend, until an import has gone through
+        if conn.execute("PRAGMA user_version").fetchone()[0] < IMPORTED_VERSION:
+            self._import_json_data()
+
+    def _get_connection(self):
+        """Get the connection for the current thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Run the enclosed statements in a single write transaction"""
+        conn = self._get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _import_json_data(self):
+        """Import products, categories and transactions from the JSON files
+
+        The import and the user_version marking it done commit together, so an
+        import that fails partway is retried on the next start.
+        """
+        from .database import create_database
+
+        # The shared instance, so this process keeps one writer and file lock per directory
+        json_db = create_database(self.data_dir, 'json')
+        with self._transaction() as conn:
+            # Another process may have imported meanwhile. Databases from before
+            # the marker was kept hold data only if their import went through.
+            imported = conn.execute("PRAGMA user_version").fetchone()[0] >= IMPORTED_VERSION or conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM categories) OR EXISTS (SELECT 1 FROM products) "
+                "OR EXISTS (SELECT 1 FROM transactions)").fetchone()[0]
+            if not imported:
+                conn.executemany(
+                    f"INSERT OR IGNORE INTO categories ({CATEGORY_COLUMNS}) VALUES (?, ?, ?)",
+                    [self._category_row(c) for c in json_db.get_all_categories()])
+                conn.executemany(
+                    f"INSERT OR IGNORE INTO products ({PRODUCT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [self._product_row(p) for p in json_db.get_all_products()])
+                conn.executemany(
+                    f"INSERT OR IGNORE INTO transactions ({TRANSACTION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [self._transaction_row(t) for t in json_db.get_all_transactions()])
+            conn.execute(f"PRAGMA user_version = {IMPORTED_VERSION}")
+
+    def commit(self):
+        """Get a future that resolves once every change made so far is durable"""
+        # Every write method commits its own SQL transaction before returning
+        return completed_future()
+
+    def get_generation(self, collection):
+        """Get the generation and last modification time (ns) of 'products', 'categories' or 'transactions'
+
+        The generation grows whenever the collection changes, in any process.
+        """
+        row = self._get_connection().execute(
+            "SELECT generation, modified FROM generations WHERE collection = ?", (collection,)).fetchone()
+        if not row:
+            raise ValueError(f"Unknown collection: {collection}")
+        return row['generation'], int(row['modified'] * 1e9)
+
+    @staticmethod
+    def _product_row(product):
+        return (product.product_id, product.name, product.description,
+                product.price, product.quantity, product.category, product.version)
+
+    @staticmethod
+    def _category_row(category):
+        return (category.category_id, category.name, category.description)
+
+    @staticmethod
+    def _transaction_row(transaction):
+        return (transaction.transaction_id, transaction.product_id, transaction.quantity,
+                transaction.transaction_type, transaction.timestamp, transaction.user, transaction.note)
+
+    # Product operations
+    def get_all_products(self):
+        """Get read-only views of all products"""
+        rows = self._get_connection().execute(
+            f"SELECT {PRODUCT_COLUMNS} FROM products ORDER BY rowid")
+        return [ProductView(dict(row)) for row in rows]
+
+    def _fetch_page(self, sql, params, limit):
+        """Run a page query that asks for one row more than the page, to tell if another page follows"""
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = params + [limit + 1]
+        rows = [dict(row) for row in self._get_connection().execute(sql, params)]
+        if limit is not None and len(rows) > limit:
+            return rows[:limit], True
+        return rows, False
+
+    def get_products_page(self, limit=None, cursor=None, sort='name'):
+        """Get a page of product views in sort order and the cursor of the next page (None on the last)"""
+        field, descending = parse_sort(sort, PRODUCT_SORT_FIELDS)
+        order, op = ("DESC", "<") if descending else ("ASC", ">")
+
+        # Keyset pagination: continue after the (field, product_id) of the last row seen
+        where = ""
+        params = []
+        if cursor:
+            where = f" WHERE ({field}, product_id) {op} (?, ?)"
+            params = list(decode_cursor(cursor, sort, (SORT_FIELD_TYPES[field], str)))
+
+        rows, more = self._fetch_page(
+            f"SELECT {PRODUCT_COLUMNS} FROM products{where} ORDER BY {field} {order}, product_id {order}",
+            params, limit)
+        next_cursor = encode_cursor(sort, (rows[-1][field], rows[-1]['product_id'])) if more else None
+        return [ProductView(row) for row in rows], next_cursor
+
+    def search_products(self, query):
+        """Get views of the products whose name or description contains every term of the query, best first"""
+        terms = query.split()
+        if not terms:
+            return self.get_all_products()
+
+        # The trigram index matches terms of three or more characters; shorter
+        # ones (and all of them without the index) are matched with LIKE
+        indexed = [term for term in terms if len(term) >= 3] if self.full_text_search else []
+        conditions = []
+        params = []
+        if indexed:
+            conditions.append("products_search MATCH ?")
+            params.append(' AND '.join('"' + term.replace('"', '""') + '"' for term in indexed))
+        for term in terms:
+            if term not in indexed:
+                pattern = _like_pattern(term)
+                conditions.append("(p.name LIKE ? ESCAPE '\\' OR p.description LIKE ? ESCAPE '\\')")
+                params.extend([pattern, pattern])
+        where = ' AND '.join(conditions)
+
+        columns = ', '.join('p.' + column for column in PRODUCT_COLUMNS.split(', '))
+        if indexed:
+            # Ranked by BM25, with matches in the name weighted above the description
+            sql = (f"SELECT {columns} FROM products_search JOIN products p ON p.rowid = products_search.rowid "
+                   f"WHERE {where} ORDER BY bm25(products_search, 2.0, 1.0), p.name")
+        else:
+            sql = f"SELECT {columns} FROM products p WHERE {where} ORDER BY p.name, p.product_id"
+        return [ProductView(dict(row)) for row in self._get_connection().execute(sql, params)]
+
+    def suggest_products(self, prefix, limit=10):
+        """Get views of up to limit products with a word of their name starting with prefix"""
+        prefix = ' '.join(prefix.split())
+        if not prefix:
+            return []
+
+        # Names starting with the prefix come first: a range on idx_products_name_nocase
+        conn = self._get_connection()
+        rows = [dict(row) for row in conn.execute(
+            f"SELECT {PRODUCT_COLUMNS} FROM products "
+            f"WHERE name COLLATE NOCASE >= ? AND name COLLATE NOCASE < ? "
+            f"ORDER BY name COLLATE NOCASE, product_id LIMIT ?",
+            (prefix, prefix + '\U0010ffff', limit))]
+
+        # Then names with a later word starting with it
+        if len(rows) < limit:
+            found = [row['product_id'] for row in rows]
+            params = [_like_pattern(prefix, '% ')]
+            if self.full_text_search and len(prefix) >= 3:
+                sql = (f"SELECT {', '.join('p.' + column for column in PRODUCT_COLUMNS.split(', '))} "
+                       f"FROM products_search JOIN products p ON p.rowid = products_search.rowid "
+                       f"WHERE products_search MATCH ? AND ' ' || p.name LIKE ? ESCAPE '\\' ")
+                params.insert(0, 'name : "' + prefix.replace('"', '""') + '"')
+            else:
+                sql = f"SELECT {PRODUCT_COLUMNS} FROM products p WHERE ' ' || p.name LIKE ? ESCAPE '\\' "
+            sql += (f"AND p.product_id NOT IN ({', '.join('?' * len(found))}) "
+                    f"ORDER BY p.name COLLATE NOCASE, p.product_id LIMIT ?")
+            rows.extend(dict(row) for row in conn.execute(sql, params + found + [limit - len(rows)]))
+
+        return [ProductView(row) for row in rows]
+
+    def get_products_by_category(self, category_id):
+        """Get views of the products in a category, looked up in idx_products_category"""
+        rows = self._get_connection().execute(
+            f"SELECT {PRODUCT_COLUMNS} FROM products WHERE category = ? ORDER BY rowid", (category_id,))
+        return [ProductView(dict(row)) for row in rows]
+
+    def count_products_by_category(self):
+        """Get the number of products in each category (category ID -> count)"""
+        # Read from the trigger-maintained totals rather than counting products
+        rows = self._get_connection().execute("SELECT category, count FROM category_totals")
+        return {row['category']: row['count'] for row in rows}
+
+    def get_low_stock_products(self, threshold):
+        """Get views of the products with at most threshold units in stock, lowest stock first"""
+        # A range scan on idx_products_quantity
+        rows = self._get_connection().execute(
+            f"SELECT {PRODUCT_COLUMNS} FROM products WHERE quantity <= ? ORDER BY quantity, product_id",
+            (threshold,))
+        return [ProductView(dict(row)) for row in rows]
+
+    def _summarize(self, category_rows):
+        """Build an inventory summary from per-category (category, count, units, cents) rows"""
+        conn = self._get_connection()
+        categories = {row['category']: (row['count'], row['units'], row['cents']) for row in category_rows}
+        low_stock_count = conn.execute(
+            "SELECT COUNT(*) FROM products WHERE quantity <= ?", (config.LOW_STOCK_THRESHOLD,)).fetchone()[0]
+        return {
+            'product_count': sum(count for count, _, _ in categories.values()),
+            'total_units': sum(units for _, units, _ in categories.values()),
+            'total_value': sum(cents for _, _, cents in categories.values()) / 100,
+            'low_stock_threshold': config.LOW_STOCK_THRESHOLD,
+            'low_stock_count': low_stock_count,
+            'categories': {
+                category: {'count': count, 'units': units, 'value': cents / 100}
+                for category, (count, units, cents) in categories.items()
+            }
+        }
+
+    def get_inventory_summary(self):
+        """Get inventory totals (overall, per category and low-stock count) without scanning products"""
+        # The low-stock count is a range count on idx_products_quantity
+        return self._summarize(self._get_connection().execute(
+            "SELECT category, count, units, cents FROM category_totals"))
+
+    def rebuild_inventory_summary(self):
+        """Recompute the inventory totals from a full scan of the products"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM category_totals")
+            conn.execute(f"INSERT INTO category_totals (category, count, units, cents) {SCAN_TOTALS}")
+            return self._summarize(conn.execute("SELECT category, count, units, cents FROM category_totals"))
+
+    def verify_inventory_summary(self):
+        """Check the inventory totals against a full scan; returns the names of totals that differ"""
+        # Both are read in one write transaction so no change lands in between
+        with self._transaction() as conn:
+            summary = self._summarize(conn.execute("SELECT category, count, units, cents FROM category_totals"))
+            return diff_summaries(summary, self._summarize(conn.execute(SCAN_TOTALS)))
+
+    def get_product_by_id(self, product_id):
+        """Get a product by ID"""
+        row = self._get_connection().execute(
+            f"SELECT {PRODUCT_COLUMNS} FROM products WHERE product_id = ?", (product_id,)).fetchone()
+        return Product.from_dict(dict(row)) if row else None
+
+    def add_product(self, product):
+        """Add a new product"""
+        return self.add_products([product])[0]
+
+    def add_products(self, products):
+        """Add several new products in one transaction; either all are added or none"""
+        try:
+            with self._transaction() as conn:
+                for product in products:
+                    conn.execute(
+                        f"INSERT INTO products ({PRODUCT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        self._product_row(product))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Product with ID {product.product_id} already exists")
+        return products
+
+    def update_product(self, product):
+        """Update an existing product, provided it is still at the version it was read at
+
+        Raises VersionConflictError if the product changed since it was read.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE products SET name = ?, description = ?, price = ?, quantity = ?, category = ?, "
+                "version = version + 1 WHERE product_id = ? AND version = ?",
+                self._product_row(product)[1:6] + (product.product_id, product.version))
+            if cursor.rowcount == 0:
+                if conn.execute("SELECT 1 FROM products WHERE product_id = ?", (product.product_id,)).fetchone():
+                    raise VersionConflictError(f"Product with ID {product.product_id} was changed by someone else")
+                raise ValueError(f"Product with ID {product.product_id} not found")
+
+        product.version += 1
+        return product
+
+    def delete_product(self, product_id):
+        """Delete a product by ID"""
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM products WHERE product_id = ?", (product_id,))
+        return cursor.rowcount > 0
+
+    # Category operations
+    def get_all_categories(self):
+        """Get read-only views of all categories"""
+        rows = self._get_connection().execute(
+            f"SELECT {CATEGORY_COLUMNS} FROM categories ORDER BY rowid")
+        return [CategoryView(dict(row)) for row in rows]
+
+    def suggest_categories(self, prefix, limit=10):
+        """Get views of up to limit categories with a word of their name starting with prefix"""
+        prefix = ' '.join(prefix.split())
+        if not prefix:
+            return []
+
+        rows = self._get_connection().execute(
+            f"SELECT {CATEGORY_COLUMNS} FROM categories WHERE ' ' || name LIKE ? ESCAPE '\\' "
+            f"ORDER BY name LIKE ? ESCAPE '\\' DESC, name COLLATE NOCASE LIMIT ?",
+            (_like_pattern(prefix, '% '), _like_pattern(prefix, ''), limit))
+        return [CategoryView(dict(row)) for row in rows]
+
+    def get_category_by_id(self, category_id):
+        """Get a category by ID"""
+        row = self._get_connection().execute(
+            f"SELECT {CATEGORY_COLUMNS} FROM categories WHERE category_id = ?", (category_id,)).fetchone()
+        return Category.from_dict(dict(row)) if row else None
+
+    def add_category(self, category):
+        """Add a new category"""
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    f"INSERT INTO categories ({CATEGORY_COLUMNS}) VALUES (?, ?, ?)",
+                    self._category_row(category))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Category with ID {category.category_id} already exists")
+        return category
+
+    def update_category(self, category):
+        """Update an existing category"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE categories SET name = ?, description = ? WHERE category_id = ?",
+                (category.name, category.description, category.category_id))
+            if cursor.rowcount == 0:
+                raise ValueError(f"Category with ID {category.category_id} not found")
+        return category
+
+    def delete_category(self, category_id):
+        """Delete a category by ID
+
+        Raises ValueError if products still belong to the category.
+        """
+        with self._transaction() as conn:
+            in_use = conn.execute(
+                "SELECT COUNT(*) FROM products WHERE category = ?", (category_id,)).fetchone()[0]
+            if in_use and conn.execute(
+                    "SELECT 1 FROM categories WHERE category_id = ?", (category_id,)).fetchone():
+                raise ValueError(f"Category with ID {category_id} still has {in_use} product(s)")
+            cursor = conn.execute("DELETE FROM categories WHERE category_id = ?", (category_id,))
+        return cursor.rowcount > 0
+
+    # Transaction operations
+    def get_all_transactions(self):
+        """Get read-only views of all transactions"""
+        rows = self._get_connection().execute(
+            f"SELECT {TRANSACTION_COLUMNS} FROM transactions ORDER BY rowid")
+        return [TransactionView(dict(row)) for row in rows]
+
+    def get_transaction_columns(self):
+        """Get the columnar analytics copy of the transactions, caught up with the table"""
+        # Imported here to keep NumPy out of the start-up of commands that never need it
+        from .analytics import TransactionColumns
+
+        with self._columns_lock:
+            if self._columns is None:
+                self._columns = TransactionColumns()
+                self._columns_rowid = 0
+
+            rows = self._get_connection().execute(
+                f"SELECT rowid, {TRANSACTION_COLUMNS} FROM transactions WHERE rowid > ? ORDER BY rowid",
+                (self._columns_rowid,))
+            for row in rows:
+                self._columns.append(dict(row))
+                self._columns_rowid = row['rowid']
+
+            return self._columns
+
+    def get_transactions_page(self, limit=None, cursor=None, sort='timestamp', product_id=None, since=None, until=None):
+        """Get a page of transaction views in time order and the cursor of the next page (None on the last)"""
+        parse_sort(sort, TRANSACTION_SORT_FIELDS)
+        order, op = ("DESC", "<") if sort.startswith('-') else ("ASC", ">")
+
+        conditions = []
+        params = []
+        if product_id:
+            conditions.append("product_id = ?")
+            params.append(product_id)
+        if since:
+            conditions.append("timestamp >= ?")
+            params.append(format_timestamp(since))
+        if until:
+            conditions.append("timestamp <= ?")
+            params.append(format_timestamp(until))
+        if cursor:
+            # Keyset pagination: continue after the (timestamp, rowid) of the last row seen
+            conditions.append(f"(timestamp, rowid) {op} (?, ?)")
+            params.extend(decode_cursor(cursor, sort, (str, int)))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        rows, more = self._fetch_page(
+            f"SELECT rowid, {TRANSACTION_COLUMNS} FROM transactions{where} "
+            f"ORDER BY timestamp {order}, rowid {order}", params, limit)
+        next_cursor = encode_cursor(sort, (rows[-1]['timestamp'], rows[-1]['rowid'])) if more else None
+        for row in rows:
+            del row['rowid']
+        return [TransactionView(row) for row in rows], next_cursor
+
+    def iter_transactions(self, product_id=None, since=None, until=None):
+        """Stream transactions, optionally filtered by product and time range"""
+        conditions = []
+        params = []
+        if product_id:
+            conditions.append("product_id = ?")
+            params.append(product_id)
+        if since:
+            conditions.append("timestamp >= ?")
+            params.append(format_timestamp(since))
+        if until:
+            conditions.append("timestamp <= ?")
+            params.append(format_timestamp(until))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # A dedicated connection keeps the cursor valid while the caller
+        # interleaves other queries on this thread. The generator may be
+        # resumed from different threads (AsyncInventoryManager reads it in
+        # batches on its pool), one at a time, so the connection is not tied
+        # to the thread that opened it
+        conn = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            for row in conn.execute(
+                    f"SELECT {TRANSACTION_COLUMNS} FROM transactions{where} ORDER BY rowid", params):
+                yield TransactionView(dict(row))
+        finally:
+            conn.close()
+
+    def add_transaction(self, transaction):
+        """Add a new transaction and update product quantity"""
+        return self.add_transactions([transaction])[0]
+
+    def add_transactions(self, transactions):
+        """Add several transactions in order in one transaction; either all are committed or none"""
+        with self._transaction() as conn:
+            for transaction in transactions:
+                row = conn.execute(
+                    "SELECT name, quantity FROM products WHERE product_id = ?",
+                    (transaction.product_id,)).fetchone()
+                if not row:
+                    raise ValueError(f"Product with ID {transaction.product_id} not found")
+
+                if transaction.transaction_type == "IN":
+                    delta = transaction.quantity
+                elif transaction.transaction_type == "OUT":
+                    if row['quantity'] < transaction.quantity:
+                        raise ValueError(f"Insufficient stock for product {row['name']}")
+                    delta = -transaction.quantity
+                else:
+                    delta = 0
+
+                conn.execute(
+                    "UPDATE products SET quantity = quantity + ?, version = version + 1 WHERE product_id = ?",
+                    (delta, transaction.product_id))
+                conn.execute(
+                    f"INSERT INTO transactions ({TRANSACTION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    self._transaction_row(transaction))
+
+        return transactions
@@ -0,0 +1,488 @@
+import json
+import os
+import shutil
+from datetime import datetime
+from . import config
+from .writer import append_file, atomic_write, completed_future, fsync_file, gather_futures
+
+# Partition name formats for each supported partitioning period
+PARTITION_FORMATS = {
+    'year': '%Y',
+    'month': '%Y-%m',
+    'day': '%Y-%m-%d',
+}
+
+# Partition for records whose timestamp cannot be parsed; it is never pruned
+UNDATED_PARTITION = 'undated'
+
+
+def _to_datetime(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _partition_bounds(name):
+    """Get the [start, end) time range covered by a partition, or None if it is unbounded"""
+    for period, fmt in PARTITION_FORMATS.items():
+        try:
+            start = datetime.strptime(name, fmt)
+        except ValueError:
+            continue
+        if period == 'year':
+            end = start.replace(year=start.year + 1)
+        elif period == 'month':
+            end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+        else:
+            end = datetime.fromordinal(start.toordinal() + 1)
+        return start, end
+    return None
+
+
+class TransactionLog:
+    """Append-only transaction log, partitioned by transaction time
+
+    Records are stored one JSON object per line in a file per period (month
+    by default) under log_dir, e.g. 2025-04.jsonl. A position in the log is a
+    dict mapping partition name to byte offset.
+
+    on_truncate is called with the number of bytes removed whenever a
+    partition is cut back, so that owners of positions into the log can tell
+    they may be past its end.
+    """
+
+    def __init__(self, log_dir, partition=None, writer=None, on_truncate=None):
+        self.log_dir = log_dir
+        self.partition = partition or config.TRANSACTION_PARTITION
+        self.writer = writer
+        self.on_truncate = on_truncate
+
+        # Notes the extent of a batch being appended across partitions, so one
+        # left part-written by a crashed writer can be rolled back
+        self.batch_file = os.path.join(log_dir, 'batch.json')
+
+        if self.partition not in PARTITION_FORMATS:
+            raise ValueError(f"Unknown transaction partitioning: {self.partition}")
+
+    def partition_for(self, timestamp):
+        """Get the name of the partition a record with this timestamp belongs to"""
+        try:
+            return _to_datetime(timestamp).strftime(PARTITION_FORMATS[self.partition])
+        except (AttributeError, TypeError, ValueError):
+            return UNDATED_PARTITION
+
+    def _partition_file(self, name):
+        return os.path.join(self.log_dir, name + '.jsonl')
+
+    def partitions(self, since=None, until=None):
+        """List partition names in order, keeping only those that overlap [since, until]"""
+        try:
+            names = sorted(f[:-len('.jsonl')] for f in os.listdir(self.log_dir) if f.endswith('.jsonl'))
+        except FileNotFoundError:
+            return []
+
+        since = _to_datetime(since)
+        until = _to_datetime(until)
+        selected = []
+        for name in names:
+            bounds = _partition_bounds(name)
+            if bounds and ((since and bounds[1] <= since) or (until and bounds[0] > until)):
+                continue
+            selected.append(name)
+        return selected
+
+    def end_position(self):
+        """Get the current end of the log: partition name -> size in bytes"""
+        position = {}
+        for name in self.partitions():
+            try:
+                position[name] = os.path.getsize(self._partition_file(name))
+            except FileNotFoundError:
+                pass
+        return position
+
+    def size_and_mtime(self):
+        """Get the total size of the log in bytes and the latest modification time (ns) of its partitions
+
+        Only the directory and file metadata are read. The size grows with
+        every record written, but shrinks when a partition is cut back, which
+        on_truncate reports.
+        """
+        size = 0
+        mtime_ns = 0
+        for name in self.partitions():
+            try:
+                stat = os.stat(self._partition_file(name))
+            except FileNotFoundError:
+                continue
+            size += stat.st_size
+            mtime_ns = max(mtime_ns, stat.st_mtime_ns)
+        return size, mtime_ns
+
+    def _cut_torn_tail(self, file_path):
+        """Truncate a partition back to its last complete line; returns its size afterwards
+
+        A writer that crashed mid-append can leave a last line without its
+        newline. Readers already ignore it, but appending after it would glue
+        the next record onto it and corrupt both. Must be called with the
+        write lock held, so a partial line can only be left over from a crash.
+        """
+        try:
+            f = open(file_path, 'rb+')
+        except FileNotFoundError:
+            return 0
+
+        with f:
+            size = f.seek(0, os.SEEK_END)
+            end = size
+            while end > 0:
+                start = max(0, end - 4096)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b'\n')
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end != size:
+                f.truncate(end)
+                self._truncated(size - end)
+            return end
+
+    def _truncated(self, removed):
+        if self.on_truncate is not None:
+            self.on_truncate(removed)
+
+    def _truncate(self, sizes):
+        """Cut partitions back to the given sizes (partition name -> size in bytes)"""
+        removed = 0
+        for name, size in sizes.items():
+            try:
+                with open(self._partition_file(name), 'rb+') as f:
+                    end = f.seek(0, os.SEEK_END)
+                    if end > size:
+                        f.truncate(size)
+                        removed += end - size
+            except FileNotFoundError:
+                pass
+        if removed:
+            self._truncated(removed)
+
+    def sync(self, names):
+        """fsync the named partitions, making everything appended to them so far durable"""
+        for name in names:
+            try:
+                fsync_file(self._partition_file(name))
+            except FileNotFoundError:
+                pass
+
+    def has_unfinished_batch(self):
+        """Check whether a batch append was interrupted and still needs recover()"""
+        return os.path.exists(self.batch_file)
+
+    def recover(self):
+        """Roll back a batch a crashed writer left part-written; the caller must hold the write lock
+
+        A batch whose partitions all reached their expected size was complete
+        and is kept.
+        """
+        try:
+            with open(self.batch_file, 'r') as f:
+                extents = json.load(f)
+        except FileNotFoundError:
+            return
+
+        position = self.end_position()
+        if any(position.get(name, 0) < end for name, (_, end) in extents.items()):
+            self._truncate({name: start for name, (start, _) in extents.items()})
+        os.remove(self.batch_file)
+
+    def _group_lines(self, records):
+        lines = {}
+        for record in records:
+            lines.setdefault(self.partition_for(record['timestamp']), []).append(json.dumps(record) + '\n')
+        return {name: ''.join(partition_lines) for name, partition_lines in lines.items()}
+
+    def write_partitions(self, records):
+        """Replace the whole log with the given records, split into partitions
+
+        Used for one-shot migrations: the partitions are written to a temporary
+        directory that is renamed into place once complete. Returns the end
+        position of the new log.
+        """
+        temp_dir = self.log_dir + '.tmp'
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+
+        position = {}
+        for name, data in self._group_lines(records).items():
+            atomic_write(os.path.join(temp_dir, name + '.jsonl'), data)
+            position[name] = len(data.encode())
+
+        shutil.rmtree(self.log_dir, ignore_errors=True)
+        os.rename(temp_dir, self.log_dir)
+        return position
+
+    def append(self, record):
+        """Append a single record to the log"""
+        return self.append_many([record])
+
+    def append_many(self, records):
+        """Append records to their partitions with a single write per partition
+
+        The records are in the log (visible to readers) when this returns.
+        Returns a future that resolves once they are durable; with a background
+        writer, appends from concurrent callers share one fsync. The caller
+        must hold the write lock.
+
+        The batch is atomic: if a write fails, the partitions already written
+        are truncated back, and a batch interrupted by a crash is rolled back
+        by the next recover().
+        """
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.recover()
+
+        lines = self._group_lines(records)
+        sizes = {name: self._cut_torn_tail(self._partition_file(name)) for name in lines}
+
+        # A single record is one line, which readers ignore until it is whole
+        batch = len(records) > 1
+        if batch:
+            extents = {name: [sizes[name], sizes[name] + len(data.encode())] for name, data in lines.items()}
+            atomic_write(self.batch_file, json.dumps(extents), durable=False)
+
+        try:
+            for name, data in lines.items():
+                append_file(self._partition_file(name), data, durable=self.writer is None)
+        except BaseException:
+            self._truncate(sizes)
+            if batch:
+                os.remove(self.batch_file)
+            raise
+        if batch:
+            os.remove(self.batch_file)
+
+        futures = []
+        for name in lines:
+            if self.writer is None:
+                futures.append(completed_future())
+            else:
+                futures.append(self.writer.submit_sync(self._partition_file(name)))
+        return gather_futures(futures)
+
+    def iter_entries(self, start=None, since=None, until=None, contains=None):
+        """Stream (partition, offset, end_offset, record) tuples for records after a position
+
+        Only partitions overlapping [since, until] are opened; records inside
+        them still need to be filtered by the caller. When contains is given,
+        lines that do not contain that text are skipped without being parsed.
+        """
+        start = start or {}
+        if contains is not None:
+            contains = contains.encode()
+
+        for name in self.partitions(since, until):
+            offset = start.get(name, 0)
+            file_path = self._partition_file(name)
+            try:
+                if os.path.getsize(file_path) <= offset:
+                    continue
+                f = open(file_path, 'rb')
+            except FileNotFoundError:
+                continue
+
+            with f:
+                f.seek(offset)
+                for line in f:
+                    # A line without its newline is a write still in progress
+                    # (or torn by a crash) and is not part of the log yet
+                    if not line.endswith(b'\n'):
+                        break
+
+                    end_offset = offset + len(line)
+                    if line.strip() and (contains is None or contains in line):
+                        yield name, offset, end_offset, json.loads(line)
+                    offset = end_offset
+
+    def iter_records(self, since=None, until=None, contains=None):
+        """Stream records from the log, opening only partitions that overlap [since, until]"""
+        for _, _, _, record in self.iter_entries(since=since, until=until, contains=contains):
+            yield record
+
+    def read_at(self, name, offsets):
+        """Stream the records starting at the given byte offsets of a partition"""
+        try:
+            f = open(self._partition_file(name), 'rb')
+        except FileNotFoundError:
+            return
+
+        with f:
+            for offset in offsets:
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+
+class LogReader:
+    """Reads the records appended to a TransactionLog since the previous read"""
+
+    def __init__(self, log, position=None):
+        self.log = log
+        self.position = dict(position or {})
+
+    def was_truncated(self):
+        """Check whether any partition shrank below the position already read"""
+        end = self.log.end_position()
+        return any(end.get(name, 0) < offset for name, offset in self.position.items())
+
+    def read_entries(self):
+        """Stream (partition, offset, record) for new records, advancing the position"""
+        for name, offset, end_offset, record in self.log.iter_entries(self.position):
+            self.position[name] = end_offset
+            yield name, offset, record
+
+    def read(self):
+        """Stream new records, advancing the position"""
+        for _, _, record in self.read_entries():
+            yield record
+
+
+class TransactionIndex:
+    """Secondary index of the log: product ID -> partition -> record offsets
+
+    The index is persisted next to the partitions as a file of JSON lines,
+    each holding the offsets added between two log positions, so a save
+    only writes what was indexed since the previous one. Loading chains the
+    lines from the start of the log, and the index catches up by reading
+    only records appended after the last position chained.
+    """
+
+    def __init__(self, log):
+        self.log = log
+        # JSON lines, but not named .jsonl so it is not taken for a partition
+        self.index_file = os.path.join(log.log_dir, 'index.log')
+        self._offsets = None
+        self._reader = None
+        self._pending = {}
+        self._saved_position = {}
+        self._rewrite = False
+        self._unsaved = 0
+
+    def _load(self):
+        self._reset()
+        try:
+            f = open(self.index_file, 'rb')
+        except FileNotFoundError:
+            return
+
+        self._rewrite = False
+        with f:
+            for line in f:
+                try:
+                    delta = json.loads(line) if line.endswith(b'\n') else None
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    delta = None
+                # Lines that do not follow on from the position reached so far
+                # (saved from a stale position by another process, or damaged)
+                # are skipped, and the file is rewritten on the next save
+                if delta is None or delta.get('from') != self._reader.position:
+                    self._rewrite = True
+                    continue
+                self._merge(self._offsets, delta['products'])
+                self._reader.position = dict(delta['to'])
+        self._saved_position = dict(self._reader.position)
+
+    def _reset(self):
+        self._offsets = {}
+        self._reader = LogReader(self.log)
+        self._pending = {}
+        self._saved_position = {}
+        self._rewrite = True
+        self._unsaved = 0
+
+    @staticmethod
+    def _merge(target, products):
+        for product_id, partitions in products.items():
+            for name, offsets in partitions.items():
+                target.setdefault(product_id, {}).setdefault(name, []).extend(offsets)
+
+    def update(self):
+        """Index records appended since the last update; returns how many were added"""
+        if self._reader is None:
+            self._load()
+        if self._reader.was_truncated():
+            # The log was replaced or truncated, rebuild from scratch
+            self._reset()
+
+        added = 0
+        for name, offset, record in self._reader.read_entries():
+            self._offsets.setdefault(record['product_id'], {}).setdefault(name, []).append(offset)
+            self._pending.setdefault(record['product_id'], {}).setdefault(name, []).append(offset)
+            added += 1
+        self._unsaved += added
+        return added
+
+    def lookup(self, product_id, since=None, until=None):
+        """Get (partition, offsets) pairs for a product's records in partitions overlapping [since, until]"""
+        self.update()
+        partitions = self._offsets.get(product_id, {})
+        return [(name, list(partitions[name])) for name in self.log.partitions(since, until) if name in partitions]
+
+    def unsaved(self):
+        """Count the records indexed since the index was last saved"""
+        return self._unsaved
+
+    def save(self):
+        """Persist the offsets indexed since the last save
+
+        Only those are appended, so a save costs the same however long the
+        log is; the whole index is written out only after it was rebuilt or
+        its file needs repairing. The index can always be rebuilt from the
+        log, so it is not fsynced.
+        """
+        if self._reader is None or not (self._pending or self._rewrite):
+            return
+
+        position = dict(self._reader.position)
+        if self._rewrite:
+            line = json.dumps({'from': {}, 'to': position, 'products': self._offsets}) + '\n'
+        else:
+            line = json.dumps({'from': self._saved_position, 'to': position, 'products': self._pending}) + '\n'
+
+        os.makedirs(self.log.log_dir, exist_ok=True)
+        if self._rewrite:
+            atomic_write(self.index_file, line, durable=False)
+            # Replaces the single-document index of earlier versions
+            try:
+                os.remove(os.path.join(self.log.log_dir, 'index.json'))
+            except FileNotFoundError:
+                pass
+        else:
+            append_file(self.index_file, line, durable=False)
+
+        self._pending = {}
+        self._saved_position = position
+        self._rewrite = False
+        self._unsaved = 0
+
+
+def read_legacy_log(file_path):
+    """Read (end_offset, record) pairs from the single-file log of an older version
+
+    Handles both the original JSON array and the single JSONL file that
+    preceded partitioning; end offsets are None for the array format.
+    """
+    with open(file_path, 'rb') as f:
+        if file_path.endswith('.json'):
+            try:
+                return [(None, record) for record in json.load(f)]
+            except json.JSONDecodeError:
+                raise ValueError(f"Cannot migrate corrupt transaction file {file_path}")
+
+        entries = []
+        offset = 0
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            if line.strip():
+                entries.append((offset, json.loads(line)))
+        return entries
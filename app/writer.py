@@ -0,0 +1,232 @@
+import atexit
+import os
+import stat
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from . import config
+
+
+def _fsync_directory(directory):
+    """Flush a directory entry so a rename in it survives a crash"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        # Not supported on every platform (e.g. Windows)
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(file_path, data, durable=True):
+    """Replace a file with data (text or bytes) via a fsynced temporary file and a rename
+
+    With durable=False nothing is fsynced: readers still never see a partial
+    file, but a crash may lose the new contents.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(file_path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(data, bytes) else 'w') as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+
+        # Keep the permissions of the file being replaced
+        try:
+            os.chmod(temp_path, stat.S_IMODE(os.stat(file_path).st_mode))
+        except FileNotFoundError:
+            os.chmod(temp_path, 0o644)
+
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    if durable:
+        _fsync_directory(directory)
+
+
+def append_file(file_path, data, durable=True):
+    """Append data to a file with a single write, optionally followed by fsync"""
+    with open(file_path, 'a') as f:
+        f.write(data)
+        f.flush()
+        if durable:
+            os.fsync(f.fileno())
+
+
+def fsync_file(file_path):
+    """Flush everything written to a file so far to disk"""
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def completed_future(result=None):
+    """Get a future that is already resolved"""
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def gather_futures(futures):
+    """Get a future that resolves once all of the given futures have"""
+    if len(futures) == 1:
+        return futures[0]
+
+    combined = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def on_done(future):
+        with lock:
+            remaining[0] -= 1
+            done = remaining[0] == 0
+        if done and not combined.done():
+            errors = [f.exception() for f in futures if f.exception()]
+            if errors:
+                combined.set_exception(errors[0])
+            else:
+                combined.set_result(None)
+
+    if not futures:
+        combined.set_result(None)
+    for future in futures:
+        future.add_done_callback(on_done)
+    return combined
+
+
+class BackgroundWriter:
+    """Background thread that group-commits file writes
+
+    Saves submitted under the same key within one interval are coalesced into a
+    single call, and syncs of the same file share a single fsync. Every
+    submission returns a future that resolves once its data is on disk.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = config.WRITE_INTERVAL if interval is None else interval
+        self._cond = threading.Condition()
+        self._saves = {}      # key -> [write_fn, futures]
+        self._syncs = {}      # file_path -> futures
+        self._barriers = []   # [future, error of a cycle that ran while it waited]
+        self._busy = False
+        self._thread = None
+
+        # Don't lose pending writes when the process exits normally
+        atexit.register(self.flush)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='BackgroundWriter', daemon=True)
+            self._thread.start()
+
+    def submit(self, key, write_fn):
+        """Schedule write_fn on the writer thread; pending submissions with the same key run once"""
+        future = Future()
+        with self._cond:
+            entry = self._saves.get(key)
+            if entry:
+                entry[0] = write_fn
+                entry[1].append(future)
+            else:
+                self._saves[key] = [write_fn, [future]]
+            self._ensure_thread()
+            self._cond.notify_all()
+        return future
+
+    def submit_sync(self, file_path):
+        """Schedule a file that has already been written to be fsynced"""
+        future = Future()
+        with self._cond:
+            self._syncs.setdefault(file_path, []).append(future)
+            self._ensure_thread()
+            self._cond.notify_all()
+        return future
+
+    def barrier(self):
+        """Get a future that resolves once everything submitted so far is on disk
+
+        It fails with the first error of the writes it waited for, so a caller
+        is never told that a failed write is committed.
+        """
+        with self._cond:
+            if not (self._saves or self._syncs or self._barriers or self._busy):
+                return completed_future()
+            future = Future()
+            self._barriers.append([future, None])
+            self._ensure_thread()
+            self._cond.notify_all()
+        return future
+
+    def flush(self, timeout=None):
+        """Block until everything submitted so far is on disk"""
+        self.barrier().result(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not (self._saves or self._syncs or self._barriers):
+                    self._cond.wait()
+
+            # Give concurrent writers a moment to join this commit
+            time.sleep(self.interval)
+
+            with self._cond:
+                saves, self._saves = self._saves, {}
+                syncs, self._syncs = self._syncs, {}
+                barriers, self._barriers = self._barriers, []
+                self._busy = True
+
+            error = None
+            try:
+                # Syncs go before saves. This alone does not keep a checkpoint
+                # behind the durable log, since records are appended outside
+                # this thread; checkpoints fsync the log up to the position
+                # they record themselves
+                for file_path, futures in syncs.items():
+                    failure = self._complete(futures, fsync_file, file_path)
+                    error = error or failure
+
+                for write_fn, futures in saves.values():
+                    failure = self._complete(futures, write_fn)
+                    error = error or failure
+            finally:
+                with self._cond:
+                    self._busy = False
+                    # Barriers that arrived while this cycle ran waited for its writes too
+                    for entry in self._barriers:
+                        entry[1] = entry[1] or error
+                    self._cond.notify_all()
+
+            for future, earlier_error in barriers:
+                if earlier_error or error:
+                    future.set_exception(earlier_error or error)
+                else:
+                    future.set_result(None)
+
+    @staticmethod
+    def _complete(futures, fn, *args):
+        """Run fn and resolve the futures waiting on it; returns the exception it raised, if any"""
+        try:
+            fn(*args)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return e
+        for future in futures:
+            future.set_result(None)
+        return None
+
@@ -15,7 +15,7 @@ from collections import defaultdict
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app.inventory_manager import InventoryManager
-from app.models import TransactionType
+from app.models import Category, TransactionType
 
 def generate_reports():
     """Generate inventory and transaction reports"""
@@ -50,14 +50,11 @@ def generate_low_stock_report(manager, reports_dir, timestamp):
         writer = csv.writer(csvfile)
         writer.writerow(['Product ID', 'Name', 'Category', 'Current Quantity', 'Alert Threshold', 'Status'])
         
-        products = manager.get_all_products()
         low_stock_threshold = 5  # Default alert threshold
         critical_threshold = 2   # Critical threshold
         
-        low_stock_products = [p for p in products if p.quantity <= low_stock_threshold]
-        
-        # Sort by quantity (lowest first)
-        low_stock_products.sort(key=lambda p: p.quantity)
+        # Already sorted by quantity (lowest first)
+        low_stock_products = manager.get_low_stock_products(low_stock_threshold)
         
         for product in low_stock_products:
             # Determine status
@@ -82,25 +79,11 @@ def generate_inventory_value_report(manager, reports_dir, timestamp):
     """Generate a report of inventory value by category"""
     filename = os.path.join(reports_dir, f"inventory_value_report_{timestamp}.csv")
     
-    products = manager.get_all_products()
-    
-    # Calculate totals by category
-    categories = {}
-    total_value = 0
-    total_items = 0
-    
-    for product in products:
-        category = product.category
-        value = product.price * product.quantity
-        
-        if category not in categories:
-            categories[category] = {'count': 0, 'value': 0, 'items': 0}
-        
-        categories[category]['count'] += 1
-        categories[category]['value'] += value
-        categories[category]['items'] += product.quantity
-        total_value += value
-        total_items += product.quantity
+    # Totals by category are maintained as products change, so no scan is needed
+    summary = manager.get_inventory_summary()
+    categories = summary['categories']
+    total_value = summary['total_value']
+    total_items = summary['total_units']
     
     with open(filename, 'w', newline='') as csvfile:
         writer = csv.writer(csvfile)
@@ -108,11 +91,11 @@ def generate_inventory_value_report(manager, reports_dir, timestamp):
         
         # Sort categories by value (highest first)
         for category, data in sorted(categories.items(), key=lambda x: x[1]['value'], reverse=True):
-            avg_value = data['value'] / data['items'] if data['items'] > 0 else 0
+            avg_value = data['value'] / data['units'] if data['units'] > 0 else 0
             writer.writerow([
                 category,
                 data['count'],
-                data['items'],
+                data['units'],
                 f"{data['value']:.2f}",
                 f"{avg_value:.2f}"
             ])
@@ -120,7 +103,7 @@ def generate_inventory_value_report(manager, reports_dir, timestamp):
         # Add summary row
         avg_total_value = total_value / total_items if total_items > 0 else 0
         writer.writerow(['', '', '', '', ''])
-        writer.writerow(['Total', len(products), total_items, f"${total_value:.2f}", f"${avg_total_value:.2f}"])
+        writer.writerow(['Total', summary['product_count'], total_items, f"${total_value:.2f}", f"${avg_total_value:.2f}"])
     
     print(f"Inventory value report generated: {filename}")
     return total_value
@@ -133,17 +116,13 @@ def generate_transaction_report(manager, reports_dir, timestamp, days=30):
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
     
-    transactions = manager.get_transaction_history()
-    
-    # Filter transactions to specified date range
-    if isinstance(transactions[0].timestamp, str):
-        # Convert string timestamps to datetime objects
-        for t in transactions:
-            if isinstance(t.timestamp, str):
-                t.timestamp = datetime.fromisoformat(t.timestamp)
-    
-    recent_transactions = [t for t in transactions 
-                          if start_date <= t.timestamp <= end_date]
+    # Stream only the transactions in the specified date range
+    recent_transactions = []
+    for t in manager.iter_transactions(since=start_date, until=end_date):
+        # Convert string timestamps to datetime objects (on a copy, the view is read-only)
+        t = t.to_model()
+        t.timestamp = datetime.fromisoformat(t.timestamp)
+        recent_transactions.append(t)
     
     # Count additions and removals
     additions = sum(1 for t in recent_transactions if t.transaction_type == "IN" or t.transaction_type == TransactionType.ADDITION)
@@ -191,33 +170,24 @@ def generate_sales_trend_report(manager, reports_dir, timestamp, days=30):
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
     
-    transactions = manager.get_transaction_history()
-    
-    # Filter transactions to removals (sales) in the specified date range
-    if isinstance(transactions[0].timestamp, str):
-        # Convert string timestamps to datetime objects
-        for t in transactions:
-            if isinstance(t.timestamp, str):
-                t.timestamp = datetime.fromisoformat(t.timestamp)
-    
-    sales_transactions = [t for t in transactions 
-                         if (start_date <= t.timestamp <= end_date) and 
-                         (t.transaction_type == "OUT" or t.transaction_type == TransactionType.REMOVAL)]
+    # Aggregate removals (sales) in the specified date range by day and product
+    columns = manager.get_transaction_columns()
+    sales_by_day = columns.quantity_by_day_and_product(start_date, end_date, TransactionType.REMOVAL)
     
     # Group by day
     daily_sales = defaultdict(lambda: defaultdict(int))
     product_names = {}
     
-    for transaction in sales_transactions:
-        day = transaction.timestamp.strftime("%Y-%m-%d")
+    for (sale_date, product_id), quantity in sales_by_day.items():
+        day = sale_date.strftime("%Y-%m-%d")
         
         # Get product name if we haven't retrieved it already
-        if transaction.product_id not in product_names:
-            product = manager.get_product(transaction.product_id)
-            product_names[transaction.product_id] = product.name if product else "Unknown"
+        if product_id not in product_names:
+            product = manager.get_product(product_id)
+            product_names[product_id] = product.name if product else "Unknown"
         
         # Aggregate quantities by day and product
-        daily_sales[day][product_names[transaction.product_id]] += transaction.quantity
+        daily_sales[day][product_names[product_id]] += quantity
     
     # Sort days
     sorted_days = sorted(daily_sales.keys())
@@ -254,34 +224,26 @@ def generate_category_performance_report(manager, reports_dir, timestamp, days=3
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
     
-    transactions = manager.get_transaction_history()
     products = {p.product_id: p for p in manager.get_all_products()}
     categories = {c.category_id: c for c in manager.get_all_categories()}
     
-    # Filter transactions to removals (sales) in the specified date range
-    if transactions and isinstance(transactions[0].timestamp, str):
-        # Convert string timestamps to datetime objects
-        for t in transactions:
-            if isinstance(t.timestamp, str):
-                t.timestamp = datetime.fromisoformat(t.timestamp)
-    
-    sales_transactions = [t for t in transactions 
-                         if (start_date <= t.timestamp <= end_date) and 
-                         (t.transaction_type == "OUT" or t.transaction_type == TransactionType.REMOVAL)]
+    # Removals (sales) per product in the specified date range
+    columns = manager.get_transaction_columns()
+    product_sales = columns.quantity_by_product(start_date, end_date, TransactionType.REMOVAL)
     
     # Aggregate by category
     category_sales = defaultdict(lambda: {'quantity': 0, 'revenue': 0})
     
-    for transaction in sales_transactions:
-        product = products.get(transaction.product_id)
+    for product_id, quantity in product_sales.items():
+        product = products.get(product_id)
         if not product:
             continue
             
         category_id = product.category
         category_name = categories.get(category_id, Category(category_id, "Unknown")).name
         
-        category_sales[category_name]['quantity'] += transaction.quantity
-        category_sales[category_name]['revenue'] += transaction.quantity * product.price
+        category_sales[category_name]['quantity'] += quantity
+        category_sales[category_name]['revenue'] += quantity * product.price
     
     with open(filename, 'w', newline='') as csvfile:
         writer = csv.writer(csvfile)
@@ -315,36 +277,25 @@ def generate_reorder_recommendation_report(manager, reports_dir, timestamp):
     """Generate recommendations for products that need to be reordered"""
     filename = os.path.join(reports_dir, f"reorder_recommendation_report_{timestamp}.csv")
     
-    products = manager.get_all_products()
     low_stock_threshold = 5
     
     # Get low stock products
-    low_stock_products = [p for p in products if p.quantity <= low_stock_threshold]
-    
-    # Get transaction history to analyze usage patterns
-    transactions = manager.get_transaction_history()
-    
-    # Convert string timestamps to datetime objects if needed
-    if transactions and isinstance(transactions[0].timestamp, str):
-        for t in transactions:
-            if isinstance(t.timestamp, str):
-                t.timestamp = datetime.fromisoformat(t.timestamp)
+    low_stock_products = manager.get_low_stock_products(low_stock_threshold)
     
     # Analyze past 30 days to determine usage rate
     end_date = datetime.now()
     start_date = end_date - timedelta(days=30)
     
+    # Total removals per product in the period
+    columns = manager.get_transaction_columns()
+    removed_quantities = columns.quantity_by_product(start_date, end_date, TransactionType.REMOVAL)
+    
     # Calculate usage rate for each product
     usage_rates = {}
     
     for product in low_stock_products:
         # Get removals for this product in the last 30 days
-        product_transactions = [t for t in transactions 
-                              if t.product_id == product.product_id and
-                              start_date <= t.timestamp <= end_date and
-                              (t.transaction_type == "OUT" or t.transaction_type == TransactionType.REMOVAL)]
-        
-        total_removed = sum(t.quantity for t in product_transactions)
+        total_removed = removed_quantities.get(product.product_id, 0)
         daily_usage = total_removed / 30  # Average daily usage
         
         # Recommend order quantity based on 30 days of future usage
@@ -396,44 +347,31 @@ def generate_summary_report(manager, reports_dir, timestamp):
     """Generate a summary report with key metrics"""
     filename = os.path.join(reports_dir, f"summary_report_{timestamp}.txt")
     
-    # Get key metrics
-    total_products = len(manager.get_all_products())
+    # Get key metrics from the maintained inventory totals
+    summary = manager.get_inventory_summary()
+    total_products = summary['product_count']
     total_categories = len(manager.get_all_categories())
-    low_stock_count = len(manager.get_low_stock_products(5))
-    
-    # Calculate inventory value
-    products = manager.get_all_products()
-    total_inventory_value = sum(p.price * p.quantity for p in products)
+    low_stock_count = summary['low_stock_count']
+    total_inventory_value = summary['total_value']
     
     # Transaction statistics (last 30 days)
-    transactions = manager.get_transaction_history()
-    
-    # Convert string timestamps to datetime objects if needed
-    if transactions and isinstance(transactions[0].timestamp, str):
-        for t in transactions:
-            if isinstance(t.timestamp, str):
-                t.timestamp = datetime.fromisoformat(t.timestamp)
-    
     end_date = datetime.now()
     start_date = end_date - timedelta(days=30)
     
-    recent_transactions = [t for t in transactions 
-                          if start_date <= t.timestamp <= end_date]
-    
-    additions = [t for t in recent_transactions 
-                if t.transaction_type == "IN" or t.transaction_type == TransactionType.ADDITION]
-    removals = [t for t in recent_transactions 
-               if t.transaction_type == "OUT" or t.transaction_type == TransactionType.REMOVAL]
-    
-    total_added = sum(t.quantity for t in additions)
-    total_removed = sum(t.quantity for t in removals)
+    # Aggregate over the columnar transaction history
+    columns = manager.get_transaction_columns()
+    recent_count = columns.count(start_date, end_date)
+    total_added = columns.total_quantity(start_date, end_date, TransactionType.ADDITION)
+    total_removed = columns.total_quantity(start_date, end_date, TransactionType.REMOVAL)
     
     # Calculate sales value
     sales_value = 0
-    for transaction in removals:
-        product = manager.get_product(transaction.product_id)
+    category_sales = defaultdict(float)
+    for product_id, quantity in columns.quantity_by_product(start_date, end_date, TransactionType.REMOVAL).items():
+        product = manager.get_product(product_id)
         if product:
-            sales_value += transaction.quantity * product.price
+            sales_value += quantity * product.price
+            category_sales[product.category] += quantity * product.price
     
     with open(filename, 'w') as file:
         file.write("=== INVENTORY MANAGEMENT SYSTEM SUMMARY REPORT ===\n")
@@ -446,23 +384,13 @@ def generate_summary_report(manager, reports_dir, timestamp):
         file.write(f"Low Stock Items: {low_stock_count}\n\n")
         
         file.write("--- 30-DAY TRANSACTION SUMMARY ---\n")
-        file.write(f"Total Transactions: {len(recent_transactions)}\n")
+        file.write(f"Total Transactions: {recent_count}\n")
         file.write(f"Items Added to Inventory: {total_added}\n")
         file.write(f"Items Removed from Inventory: {total_removed}\n")
         file.write(f"Sales Value: ${sales_value:.2f}\n\n")
         
         # Top categories by sales
         file.write("--- TOP CATEGORIES BY SALES ---\n")
-        category_sales = defaultdict(float)
-        
-        for transaction in removals:
-            product = manager.get_product(transaction.product_id)
-            if not product:
-                continue
-                
-            category_name = product.category
-            category_sales[category_name] += transaction.quantity * product.price
-        
         for i, (category, value) in enumerate(sorted(category_sales.items(), 
                                                   key=lambda x: x[1], 
                                                   reverse=True)[:5], 1):
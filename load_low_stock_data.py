@@ -109,43 +109,42 @@ def load_low_stock_data():
     ]
     
     # Add low stock products
+    existing_products = {p.name: p for p in manager.get_all_products()}
+    new_products = []
     for product_data in low_stock_products:
         try:
             # Check if product with same name already exists
-            existing_products = manager.get_all_products()
-            product_exists = False
-            
-            for existing_product in existing_products:
-                if existing_product.name == product_data["name"]:
-                    product_exists = True
-                    print(f"Product already exists: {product_data['name']}")
-                    
-                    # Update to low quantity if it exists
-                    manager.update_product(
-                        existing_product.product_id, 
-                        quantity=product_data["quantity"]
-                    )
-                    print(f"Updated {product_data['name']} to low stock: {product_data['quantity']} units")
-                    break
-            
-            if not product_exists:
-                # Get category ID
-                category_name = product_data.pop("category")
-                category_id = category_ids.get(category_name)
+            existing_product = existing_products.get(product_data["name"])
+            if existing_product:
+                print(f"Product already exists: {product_data['name']}")
                 
-                if not category_id:
-                    print(f"Category not found for product {product_data['name']}")
-                    continue
-                
-                # Add product
-                product = manager.add_product(
-                    **product_data,
-                    category=category_id
+                # Update to low quantity if it exists
+                manager.update_product(
+                    existing_product.product_id, 
+                    quantity=product_data["quantity"]
                 )
-                print(f"Added low stock product: {product_data['name']} ({product_data['quantity']} units)")
+                print(f"Updated {product_data['name']} to low stock: {product_data['quantity']} units")
+                continue
+            
+            # Get category ID
+            category_name = product_data.pop("category")
+            category_id = category_ids.get(category_name)
+            
+            if not category_id:
+                print(f"Category not found for product {product_data['name']}")
+                continue
+            
+            new_products.append(dict(product_data, category=category_id))
         except Exception as e:
             print(f"Error adding/updating product {product_data['name']}: {str(e)}")
     
+    # Add all new products in a single save
+    try:
+        for product in manager.add_products(new_products):
+            print(f"Added low stock product: {product.name} ({product.quantity} units)")
+    except Exception as e:
+        print(f"Error adding low stock products: {str(e)}")
+    
     # Get all products with low stock (5 or fewer)
     low_stock = manager.get_low_stock_products(5)
     print(f"\nLow stock loading complete! {len(low_stock)} products with 5 or fewer units in stock.")
@@ -302,35 +302,30 @@ def load_sample_data():
     ]
     
     # Add products
+    existing_names = {p.name for p in manager.get_all_products()}
+    new_products = []
     for product_data in products:
-        try:
-            # Check if product with same name already exists
-            existing_products = manager.get_all_products()
-            product_exists = False
-            
-            for existing_product in existing_products:
-                if existing_product.name == product_data["name"]:
-                    product_exists = True
-                    print(f"Product already exists: {product_data['name']}")
-                    break
-            
-            if not product_exists:
-                # Get category ID
-                category_name = product_data.pop("category")
-                category_id = category_ids.get(category_name)
-                
-                if not category_id:
-                    print(f"Category not found for product {product_data['name']}")
-                    continue
-                
-                # Add product
-                product = manager.add_product(
-                    **product_data,
-                    category=category_id
-                )
-                print(f"Added product: {product_data['name']}")
-        except Exception as e:
-            print(f"Error adding product {product_data['name']}: {str(e)}")
+        # Check if product with same name already exists
+        if product_data["name"] in existing_names:
+            print(f"Product already exists: {product_data['name']}")
+            continue
+        
+        # Get category ID
+        category_name = product_data.pop("category")
+        category_id = category_ids.get(category_name)
+        
+        if not category_id:
+            print(f"Category not found for product {product_data['name']}")
+            continue
+        
+        new_products.append(dict(product_data, category=category_id))
+    
+    # Add all new products in a single save
+    try:
+        for product in manager.add_products(new_products):
+            print(f"Added product: {product.name}")
+    except Exception as e:
+        print(f"Error adding products: {str(e)}")
     
     print("\nSample data loading complete!")
     print(f"{len(category_ids)} categories available")
@@ -35,9 +35,12 @@ def load_transaction_data():
     # We'll create a mix of ADDITION and REMOVAL transactions over the past 30 days
     print("Creating sample transactions...")
     
-    transaction_count = 0
+    transactions = []
     now = datetime.now()
     
+    # Track quantities locally so generated removals never exceed stock
+    quantities = {p.product_id: p.quantity for p in products}
+    
     for i in range(30):  # For the past 30 days
         transaction_date = now - timedelta(days=i)
         
@@ -55,20 +58,26 @@ def load_transaction_data():
             if transaction_type == TransactionType.ADDITION:
                 quantity = random.randint(1, 10)
                 note = f"Restocked {product.name}"
+                quantities[product.product_id] += quantity
             else:
                 quantity = random.randint(1, 3)
                 note = f"Sold {product.name}"
+                if quantities[product.product_id] < quantity:
+                    continue
+                quantities[product.product_id] -= quantity
             
             # Create transaction with the specific date
-            manager.add_transaction(
-                product_id=product.product_id,
-                quantity=quantity,
-                transaction_type=transaction_type,
-                note=note,
-                timestamp=transaction_date
-            )
-            
-            transaction_count += 1
+            transactions.append({
+                'product_id': product.product_id,
+                'quantity': quantity,
+                'transaction_type': transaction_type,
+                'note': note,
+                'timestamp': transaction_date
+            })
+    
+    # Record all transactions in a single save
+    manager.add_transactions(transactions)
+    transaction_count = len(transactions)
     
     print(f"Transaction loading complete! Added {transaction_count} sample transactions.")
 
@@ -0,0 +1,50 @@
+import threading
+import unittest
+from datetime import date
+
+from app.analytics import TransactionColumns
+
+
+class TransactionColumnsTest(unittest.TestCase):
+    def test_aggregate_while_appending(self):
+        columns = TransactionColumns()
+        errors = []
+
+        def append():
+            for i in range(10000):
+                columns.append({'timestamp': '2025-04-01T10:00:00', 'product_id': f'p{i % 50}',
+                                'quantity': 1, 'transaction_type': 'IN'})
+
+        def aggregate():
+            try:
+                for _ in range(100):
+                    columns.quantity_by_product()
+                    columns.quantity_by_day_and_product(since='2025-01-01')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=append)] + [threading.Thread(target=aggregate) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(columns.total_quantity(), 10000)
+
+    def test_undated_records(self):
+        columns = TransactionColumns()
+        columns.extend([
+            {'timestamp': '2025-04-01T10:00:00', 'product_id': 'p1', 'quantity': 2, 'transaction_type': 'IN'},
+            {'timestamp': 'not a date', 'product_id': 'p1', 'quantity': 3, 'transaction_type': 'IN'},
+            {'timestamp': None, 'product_id': 'p2', 'quantity': 4, 'transaction_type': 'OUT'},
+        ])
+
+        self.assertEqual(columns.count(), 3)
+        self.assertEqual(columns.quantity_by_product(), {'p1': 5, 'p2': 4})
+        self.assertEqual(columns.total_quantity(since='2025-01-01'), 2)
+        self.assertEqual(columns.quantity_by_day_and_product(), {(date(2025, 4, 1), 'p1'): 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import asyncio
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Executor, Future
+
+from app.async_inventory_manager import AsyncInventoryManager
+
+
+class ThreadPerCallExecutor(Executor):
+    """Runs every call on a new thread, as a busy pool may"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run).start()
+        return future
+
+
+class AsyncInventoryManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+
+    def test_iter_transactions_across_threads(self):
+        async def run(backend):
+            manager = AsyncInventoryManager(self.data_dir, backend, executor=ThreadPerCallExecutor())
+            category = await manager.add_category('Tools')
+            product = await manager.add_product(f'Saw ({backend})', 'Hand saw', 12.0, 3, category.category_id)
+            for _ in range(5):
+                await manager.add_stock(product.product_id, 1)
+            return [t async for t in manager.iter_transactions(product.product_id, batch_size=2)]
+
+        for backend in ('json', 'sqlite'):
+            with self.subTest(backend=backend):
+                self.assertEqual(len(asyncio.run(run(backend))), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from app import config
+from app.indexes import encode_cursor
+from app.inventory_manager import InventoryManager
+from app.sqlite_database import SQLiteDatabase
+
+
+class DatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+        self.manager = InventoryManager(self.data_dir, backend='json')
+
+    def run_threads(self, *targets):
+        errors = []
+
+        def run(target):
+            try:
+                target()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_list_while_writing(self):
+        # Switch threads as often as possible to make the race likely
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+
+        category = self.manager.add_category('Tools')
+        done = threading.Event()
+
+        def write():
+            try:
+                for i in range(50):
+                    self.manager.add_category(f'Category {i}')
+                    product = self.manager.add_product(f'Product {i}', '', 1.0, 1, category.category_id)
+                    self.manager.delete_product(product.product_id)
+            finally:
+                done.set()
+
+        def read():
+            while not done.is_set():
+                self.manager.get_all_products()
+                self.manager.get_all_categories()
+
+        with mock.patch.object(config, 'SNAPSHOT_CACHE', False):
+            errors = self.run_threads(write, read, read)
+        self.assertEqual(errors, [])
+
+    def test_concurrent_removals_do_not_oversell(self):
+        for backend in ('json', 'sqlite'):
+            with self.subTest(backend=backend):
+                data_dir = tempfile.mkdtemp()
+                self.addCleanup(shutil.rmtree, data_dir, ignore_errors=True)
+                manager = InventoryManager(data_dir, backend=backend)
+                category = manager.add_category('Tools')
+                product = manager.add_product('Drill', 'Cordless drill', 80.0, 20, category.category_id)
+                removed = []
+
+                def remove():
+                    for _ in range(5):
+                        try:
+                            manager.remove_stock(product.product_id, 1)
+                            removed.append(1)
+                        except ValueError:
+                            pass
+
+                self.assertEqual(self.run_threads(*[remove] * 8), [])
+                self.assertEqual(len(removed), 20)
+                self.assertEqual(manager.get_product(product.product_id).quantity, 0)
+
+    def test_crafted_cursors_are_rejected(self):
+        cursors = [['name'], ['name', 1, 'x'], ['name', 'a', 'b', 'c'], ['name', None, 'x'], ['price', 'a', 'x'],
+                   ['timestamp', 1, 'x', 0], ['timestamp', '2024-01-01', 'x', 'y']]
+        for backend in ('json', 'sqlite'):
+            data_dir = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, data_dir, ignore_errors=True)
+            manager = InventoryManager(data_dir, backend=backend)
+            category = manager.add_category('Tools')
+            manager.add_product('Drill', 'Cordless drill', 80.0, 20, category.category_id)
+            for sort, *key in cursors:
+                cursor = encode_cursor(sort, key)
+                with self.subTest(backend=backend, cursor=[sort] + key):
+                    with self.assertRaises(ValueError):
+                        if sort == 'timestamp':
+                            manager.get_transactions_page(10, cursor, sort)
+                        else:
+                            manager.get_products_page(10, cursor, sort)
+
+    def test_failed_import_is_retried(self):
+        category = self.manager.add_category('Tools')
+        self.manager.add_product('Drill', 'Cordless drill', 80.0, 20, category.category_id)
+        self.manager.add_product('Saw', 'Hand saw', 20.0, 5, category.category_id)
+
+        # Fail halfway through the import, after the categories went in
+        with mock.patch.object(SQLiteDatabase, '_product_row', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                SQLiteDatabase(self.data_dir)
+
+        db = SQLiteDatabase(self.data_dir)
+        self.assertEqual(sorted(p.name for p in db.get_all_products()), ['Drill', 'Saw'])
+        self.assertEqual([c.name for c in db.get_all_categories()], ['Tools'])
+
+        # Once imported, products deleted from SQLite are not brought back
+        db.delete_product(db.get_all_products()[0].product_id)
+        self.assertEqual(len(SQLiteDatabase(self.data_dir).get_all_products()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
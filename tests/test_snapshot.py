@@ -0,0 +1,44 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from app.snapshot import FORMAT, content_digest, dump_snapshot, load_snapshot, snapshot_path
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+        self.file_path = os.path.join(self.data_dir, 'products.json')
+        self.content = b'[]'
+
+    def write_snapshot(self, data):
+        with open(snapshot_path(self.file_path), 'wb') as f:
+            f.write(data)
+
+    def test_round_trip(self):
+        self.write_snapshot(dump_snapshot(self.content, 1, [{'product_id': 'a'}]))
+        self.assertEqual(load_snapshot(self.file_path, self.content, 1), [{'product_id': 'a'}])
+        self.assertIsNone(load_snapshot(self.file_path, self.content, 2))
+
+    def test_unreadable_snapshots_are_ignored(self):
+        key = pickle.dumps((FORMAT, len(self.content), 1, content_digest(self.content)))
+        snapshots = {
+            'empty': b'',
+            'truncated': key[:-3],
+            'missing data': key,
+            # Same-length names keep the pickle well-formed
+            'missing module': key + pickle.dumps(unittest.TestCase).replace(b'unittest.case', b'no_such.madle'),
+            'missing class': key + pickle.dumps(unittest.TestCase).replace(b'TestCase', b'NoSuchXY'),
+            'garbage': os.urandom(64),
+        }
+        for name, data in snapshots.items():
+            with self.subTest(name):
+                self.write_snapshot(data)
+                self.assertIsNone(load_snapshot(self.file_path, self.content, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import os
+import shutil
+import tempfile
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from app import transaction_log
+from app.database import Database
+from app.inventory_manager import InventoryManager
+from app.models import Transaction
+from app.transaction_log import TransactionIndex
+
+
+class TransactionLogTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+        self.manager = InventoryManager(self.data_dir, backend='json')
+        category = self.manager.add_category('Tools')
+        self.product = self.manager.add_product('Hammer', 'Claw hammer', 9.5, 10, category.category_id)
+        self.log = self.manager.db.transaction_log
+
+    def reopen(self):
+        """Load the data directory afresh, as another process would"""
+        return Database(self.data_dir)
+
+    def test_append_after_torn_tail(self):
+        self.manager.add_stock(self.product.product_id, 1)
+        name = self.log.partitions()[-1]
+        with open(self.log._partition_file(name), 'a') as f:
+            f.write('{"transaction_id": "torn", "produ')
+
+        self.manager.add_stock(self.product.product_id, 2)
+
+        db = self.reopen()
+        self.assertEqual(db.get_product_by_id(self.product.product_id).quantity, 13)
+        self.assertEqual(len(db.get_all_transactions()), 2)
+
+    def stock_in(self, quantity, timestamp):
+        return Transaction(f"t-{timestamp}", self.product.product_id, quantity, "IN", timestamp)
+
+    def test_failed_batch_is_rolled_back(self):
+        batch = [self.stock_in(5, '2025-03-31T23:00:00'), self.stock_in(1, '2025-04-01T01:00:00')]
+        writes = []
+
+        def append_file(file_path, data, durable=True):
+            # The second partition's write fails after the first succeeded
+            if writes:
+                raise OSError("No space left on device")
+            writes.append(file_path)
+            return original(file_path, data, durable)
+
+        original = transaction_log.append_file
+        with mock.patch.object(transaction_log, 'append_file', append_file):
+            with self.assertRaises(OSError):
+                self.manager.db.add_transactions(batch)
+
+        self.assertEqual(self.manager.get_product(self.product.product_id).quantity, 10)
+        db = self.reopen()
+        self.assertEqual(db.get_product_by_id(self.product.product_id).quantity, 10)
+        self.assertEqual(db.get_all_transactions(), [])
+
+    def test_crashed_batch_is_rolled_back(self):
+        self.manager.add_stock(self.product.product_id, 1)
+        name = self.log.partitions()[-1]
+        file_path = self.log._partition_file(name)
+        size = self.log.end_position()[name]
+
+        # A crash after the first of two partitions got its records
+        record = self.stock_in(5, datetime.now().isoformat()).to_dict()
+        with open(self.log.batch_file, 'w') as f:
+            json.dump({name: [size, size + 200], 'undated': [0, 100]}, f)
+        with open(file_path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+        db = self.reopen()
+        self.assertEqual(db.get_product_by_id(self.product.product_id).quantity, 11)
+        self.assertFalse(self.log.has_unfinished_batch())
+        self.assertEqual(self.log.end_position()[name], size)
+
+    def test_checkpoint_syncs_log_first(self):
+        self.manager.add_stock(self.product.product_id, 1)
+        name = self.log.partitions()[-1]
+        synced = []
+        with mock.patch.object(transaction_log, 'fsync_file', synced.append):
+            self.manager.db.checkpoint().result()
+        self.assertIn(self.log._partition_file(name), synced)
+
+    def test_products_reload_after_log_truncation(self):
+        self.manager.add_stock(self.product.product_id, 1)
+        name = self.log.partitions()[-1]
+        self.assertEqual(self.manager.get_product(self.product.product_id).quantity, 11)
+
+        # Another process cuts the only record back off the log
+        other = self.reopen()
+        with other.file_lock.exclusive():
+            other.transaction_log._truncate({name: 0})
+
+        self.assertEqual(self.manager.get_product(self.product.product_id).quantity, 10)
+
+    def test_generation_grows_across_truncation(self):
+        db = self.manager.db
+        self.manager.add_stock(self.product.product_id, 1)
+        name = self.log.partitions()[-1]
+        size = self.log.end_position()[name]
+        generations = [db.get_generation('transactions')[0], db.get_generation('products')[0]]
+
+        # Roll the record back and log one of the same size in its place
+        with db.file_lock.exclusive():
+            self.log._truncate({name: 0})
+        self.manager.add_stock(self.product.product_id, 1)
+        self.assertEqual(self.log.end_position()[name], size)
+
+        self.assertGreater(db.get_generation('transactions')[0], generations[0])
+        self.assertGreater(db.get_generation('products')[0], generations[1])
+
+    def test_index_saves_append_only_new_offsets(self):
+        index = self.manager.db.transaction_index
+        for saves in range(1, 4):
+            self.manager.add_stock(self.product.product_id, 1)
+            self.manager.db.checkpoint()
+            with open(index.index_file) as f:
+                lines = f.readlines()
+            self.assertEqual(len(lines), saves)
+            self.assertEqual(sum(len(offsets) for offsets in json.loads(lines[-1])['products'][self.product.product_id].values()), 1)
+
+        loaded = TransactionIndex(self.log)
+        self.assertEqual(loaded.update(), 0)
+        self.assertEqual(loaded.lookup(self.product.product_id), index.lookup(self.product.product_id))
+
+    def test_index_skips_stale_saves(self):
+        self.manager.add_stock(self.product.product_id, 1)
+        self.manager.db.checkpoint()
+        index = self.manager.db.transaction_index
+        with open(index.index_file, 'a') as f:
+            # Saved from an older position by another process, then torn by a crash
+            f.write(json.dumps({'from': {}, 'to': self.log.end_position(), 'products': {'other': {}}}) + '\n')
+            f.write('{"from": ')
+
+        loaded = TransactionIndex(self.log)
+        self.assertEqual(loaded.lookup(self.product.product_id), index.lookup(self.product.product_id))
+        self.assertNotIn('other', loaded._offsets)
+
+        loaded.save()
+        with open(index.index_file) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+    def test_time_bounds(self):
+        self.manager.add_stock(self.product.product_id, 1)
+        now = datetime.now().astimezone()
+        hour = timedelta(hours=1)
+
+        for backend in ('json', 'sqlite'):
+            manager = InventoryManager(self.data_dir, backend=backend)
+            # Aware bounds, in UTC with a trailing Z or as datetimes, match local timestamps
+            since = (now - hour).astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+            self.assertEqual(len(manager.get_transaction_history(since=since)), 1)
+            self.assertEqual(len(manager.get_transaction_history(since=now + hour)), 0)
+            page, _ = manager.get_transactions_page(limit=10, since=since, until=now + hour)
+            self.assertEqual(len(page), 1)
+
+            for bound in ('garbage', '2025-04'):
+                with self.assertRaises(ValueError):
+                    manager.iter_transactions(since=bound)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import threading
+import unittest
+
+from app.writer import BackgroundWriter
+
+
+class BackgroundWriterTest(unittest.TestCase):
+    def test_barrier_reports_failed_write(self):
+        writer = BackgroundWriter(interval=0)
+
+        def fail():
+            raise OSError("No space left on device")
+
+        save = writer.submit('a', fail)
+        other = writer.submit('b', lambda: None)
+        with self.assertRaises(OSError):
+            writer.barrier().result(5)
+        with self.assertRaises(OSError):
+            save.result(5)
+        self.assertIsNone(other.result(5))
+
+        # Later cycles are not blamed for it
+        writer.submit('a', lambda: None)
+        self.assertIsNone(writer.barrier().result(5))
+
+    def test_barrier_waits_for_running_cycle(self):
+        writer = BackgroundWriter(interval=0)
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_failure():
+            started.set()
+            release.wait(5)
+            raise OSError("I/O error")
+
+        writer.submit('a', slow_failure)
+        started.wait(5)
+        # Submitted while the failing write is running
+        barrier = writer.barrier()
+        release.set()
+        with self.assertRaises(OSError):
+            barrier.result(5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,18 @@
 import os
 import sys
 import json
-from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+import functools
+from datetime import datetime, timezone
+from flask import (Flask, Response, render_template, request, redirect, url_for, flash, jsonify, session,
+                   make_response)
 
 # Add the parent directory to sys.path so we can import the inventory modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from app import config
+from app.caching import GenerationCache, Payload
 from app.inventory_manager import InventoryManager
-from app.models import Product, Category, Transaction
+from app.models import Product, Category, Transaction, VersionConflictError
 
 app = Flask(__name__)
 app.secret_key = 'inventory_management_secret_key'  # For flash messages and sessions
@@ -19,22 +23,59 @@ data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__
 # Create inventory manager instance
 inventory_manager = InventoryManager(data_dir)
 
+# Serialized API responses and rendered pages, valid while the data they were built from is unchanged
+payload_cache = GenerationCache()
+page_cache = GenerationCache()
+
+def cached_page(*collections):
+    """Decorate a page view whose output only depends on its URL and the given collections
+
+    The rendered HTML is cached per URL and served while none of the
+    collections has changed, skipping both loading the data and rendering
+    the templates. Pages showing flashed messages are rendered afresh and not
+    cached, as the messages belong to that one request.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if session.get('_flashes'):
+                return view(*args, **kwargs)
+            
+            generation = tuple(inventory_manager.get_generation(collection) for collection in collections)
+            html = page_cache.get(request.full_path, generation)
+            if html is None:
+                html = view(*args, **kwargs)
+                page_cache.put(request.full_path, generation, html)
+            return html
+        return wrapper
+    return decorator
+
+@app.after_request
+def invalidate_pages(response):
+    """Drop rendered pages after every form submission, as it may have changed the data they show"""
+    if request.method == 'POST':
+        page_cache.clear()
+    return response
+
 @app.route('/')
+@cached_page('products', 'categories')
 def home():
     """Home page with dashboard"""
     products = inventory_manager.get_all_products()
     categories = inventory_manager.get_all_categories()
-    low_stock = inventory_manager.get_low_stock_products(5)
+    low_stock = inventory_manager.get_low_stock_products(config.LOW_STOCK_THRESHOLD)
+    summary = inventory_manager.get_inventory_summary()
     return render_template('index.html', 
                           products=products, 
                           categories=categories, 
                           low_stock=low_stock,
-                          product_count=len(products),
+                          product_count=summary['product_count'],
                           category_count=len(categories),
-                          low_stock_count=len(low_stock))
+                          low_stock_count=summary['low_stock_count'])
 
 # Product routes
 @app.route('/products')
+@cached_page('products', 'categories')
 def list_products():
     """List all products"""
     products = inventory_manager.get_all_products()
@@ -101,10 +142,18 @@ def edit_product(product_id):
                     flash(f"Category with ID {category} not found", "danger")
                     return redirect(url_for('edit_product', product_id=product_id))
                 update_data['category'] = category
+            # Only save over the version the form was filled from, so stock
+            # movements made meanwhile are not overwritten with a stale quantity
+            if request.form.get('version'):
+                update_data['version'] = int(request.form['version'])
             
             updated_product = inventory_manager.update_product(product_id, **update_data)
             flash(f"Product '{updated_product.name}' updated successfully", "success")
             return redirect(url_for('list_products'))
+        except VersionConflictError:
+            flash("The product was changed by someone else while you were editing it. "
+                  "Check the current values below and save again.", "warning")
+            return redirect(url_for('edit_product', product_id=product_id))
         except ValueError as e:
             flash(f"Error: {str(e)}", "danger")
             return redirect(url_for('edit_product', product_id=product_id))
@@ -141,10 +190,12 @@ def search_products():
 
 # Category routes
 @app.route('/categories')
+@cached_page('categories', 'products')
 def list_categories():
     """List all categories"""
     categories = inventory_manager.get_all_categories()
-    return render_template('categories.html', categories=categories)
+    product_counts = inventory_manager.count_products_by_category()
+    return render_template('categories.html', categories=categories, product_counts=product_counts)
 
 @app.route('/categories/add', methods=['GET', 'POST'])
 def add_category():
@@ -202,10 +253,13 @@ def delete_category(category_id):
         flash(f"Category with ID {category_id} not found", "danger")
         return redirect(url_for('list_categories'))
     
-    if inventory_manager.delete_category(category_id):
-        flash(f"Category deleted successfully", "success")
-    else:
-        flash(f"Failed to delete category", "danger")
+    try:
+        if inventory_manager.delete_category(category_id):
+            flash(f"Category deleted successfully", "success")
+        else:
+            flash(f"Failed to delete category", "danger")
+    except ValueError as e:
+        flash(f"Error: {str(e)}", "danger")
     
     return redirect(url_for('list_categories'))
 
@@ -296,6 +350,7 @@ def list_transactions():
 
 # Low stock alert
 @app.route('/low-stock')
+@cached_page('products', 'categories')
 def low_stock():
     """Show products with low stock"""
     threshold = request.args.get('threshold', 10, type=int)
@@ -304,24 +359,132 @@ def low_stock():
     return render_template('low_stock.html', products=products, categories=categories, threshold=threshold)
 
 # API endpoints for potential future use with AJAX
+def get_page_args():
+    """Read the limit/cursor/sort pagination parameters; returns None if none were given"""
+    if not any(name in request.args for name in ('limit', 'cursor', 'sort')):
+        return None
+    
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise ValueError("limit must be a positive number")
+    return limit, request.args.get('cursor'), request.args.get('sort')
+
+def page_response(items, next_cursor):
+    """Build the JSON response for one page of results"""
+    return jsonify({'items': [item.to_dict() for item in items], 'next_cursor': next_cursor})
+
+def conditional(collection):
+    """Decorate an API endpoint whose response only changes with the given collection
+
+    Responses carry an ETag and Last-Modified derived from the collection's
+    generation. A request whose If-None-Match shows the client already has the
+    current data is answered with 304 without calling the endpoint.
+    If-Modified-Since is not used for that: at one-second resolution it cannot
+    tell apart two writes within the same second. Otherwise the serialized
+    body (and its gzip form, sent to clients that accept it) is cached per URL
+    and served as is until the collection changes. Streamed responses are passed through uncached.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            generation, modified_ns = inventory_manager.get_generation(collection)
+            etag = f"{collection}-{generation}-{modified_ns:x}"
+            last_modified = datetime.fromtimestamp(modified_ns // 10**9, timezone.utc)
+            
+            # The ETag is weak because the plain and gzip bodies share it
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                payload = payload_cache.get(request.full_path, etag)
+                if payload is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    if not response.is_streamed:
+                        payload = Payload(response.get_data(), response.mimetype)
+                        payload_cache.put(request.full_path, etag, payload)
+                
+                if payload is not None:
+                    compressed = payload.gzipped() if request.accept_encodings['gzip'] else None
+                    response = Response(compressed or payload.body, mimetype=payload.mimetype)
+                    if compressed:
+                        response.headers['Content-Encoding'] = 'gzip'
+            
+            response.vary.add('Accept-Encoding')
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
+
 @app.route('/api/products', methods=['GET'])
+@conditional('products')
 def api_products():
-    """API endpoint to get products"""
+    """API endpoint to get products, a page at a time when limit, cursor or sort is given"""
+    try:
+        page_args = get_page_args()
+        if page_args:
+            limit, cursor, sort = page_args
+            return page_response(*inventory_manager.get_products_page(limit, cursor, sort or 'name'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     products = inventory_manager.get_all_products()
     return jsonify([product.to_dict() for product in products])
 
+@app.route('/api/products/suggest', methods=['GET'])
+def api_suggest_products():
+    """API endpoint for search type-ahead: categories and products whose name has a word starting with q"""
+    limit = request.args.get('limit', 10, type=int)
+    if limit < 1:
+        return jsonify({'error': "limit must be a positive number"}), 400
+    
+    suggestions = inventory_manager.suggest(request.args.get('q', ''), limit)
+    return jsonify({
+        'categories': [{'category_id': c.category_id, 'name': c.name} for c in suggestions['categories']],
+        'products': [{'product_id': p.product_id, 'name': p.name, 'category': p.category}
+                     for p in suggestions['products']]
+    })
+
 @app.route('/api/categories', methods=['GET'])
+@conditional('categories')
 def api_categories():
     """API endpoint to get categories"""
     categories = inventory_manager.get_all_categories()
     return jsonify([category.to_dict() for category in categories])
 
 @app.route('/api/transactions', methods=['GET'])
+@conditional('transactions')
 def api_transactions():
-    """API endpoint to get transactions"""
+    """API endpoint to get transactions, a page at a time when limit, cursor or sort is given"""
     product_id = request.args.get('product_id')
-    transactions = inventory_manager.get_transaction_history(product_id)
-    return jsonify([transaction.to_dict() for transaction in transactions])
+    since = request.args.get('since')
+    until = request.args.get('until')
+    
+    try:
+        page_args = get_page_args()
+        if page_args:
+            limit, cursor, sort = page_args
+            return page_response(*inventory_manager.get_transactions_page(
+                limit, cursor, sort or 'timestamp', product_id, since, until))
+        # Bounds are validated here, before the response starts streaming
+        transactions = inventory_manager.iter_transactions(product_id, since, until)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Stream the JSON array so large histories are never held in memory
+    def generate():
+        yield '['
+        for i, transaction in enumerate(transactions):
+            yield (',' if i else '') + json.dumps(transaction.to_dict())
+        yield ']'
+    
+    return Response(generate(), mimetype='application/json')
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000) 
\ No newline at end of file
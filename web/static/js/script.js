@@ -62,6 +62,43 @@ document.addEventListener('DOMContentLoaded', function() {
                 searchInput.focus();
             }
         });
+
+        // Type-ahead suggestions for the search box
+        var suggestionList = document.getElementById('searchSuggestions');
+        var suggestTimer = null;
+        var suggestRequest = 0;
+        searchInput.addEventListener('input', function() {
+            clearTimeout(suggestTimer);
+            suggestTimer = setTimeout(function() {
+                var query = searchInput.value.trim();
+                var request = ++suggestRequest;
+                if (!query) {
+                    suggestionList.innerHTML = '';
+                    return;
+                }
+
+                fetch(searchInput.dataset.suggestUrl + '?limit=8&q=' + encodeURIComponent(query))
+                    .then(function(response) { return response.json(); })
+                    .then(function(data) {
+                        // Ignore answers to queries the user has already typed past
+                        if (request !== suggestRequest) {
+                            return;
+                        }
+                        suggestionList.innerHTML = '';
+                        var names = [];
+                        // Only product names: the search box searches products
+                        data.products.forEach(function(item) {
+                            if (names.indexOf(item.name) === -1) {
+                                names.push(item.name);
+                                var option = document.createElement('option');
+                                option.value = item.name;
+                                suggestionList.appendChild(option);
+                            }
+                        });
+                    })
+                    .catch(function() {});
+            }, 150);
+        });
     }
 
     // Threshold adjustment in low stock page